@@ -19,6 +19,7 @@ from odoo.tools.safe_eval import safe_eval
 
 from odoo.addons.base.maintenance.migrations import util
 from odoo.addons.base.maintenance.migrations.testing import UnitTestCase, parametrize
+from odoo.addons.base.maintenance.migrations.util.accounting import no_fiscal_lock
 from odoo.addons.base.maintenance.migrations.util.domains import _adapt_one_domain, _model_of_path
 from odoo.addons.base.maintenance.migrations.util.exceptions import MigrationError
 
@@ -765,6 +766,36 @@ class TestPG(UnitTestCase):
         cr.execute(util.format_query(cr, "SELECT 1 FROM {}", TEST_TABLE_NAME))
         self.assertFalse(cr.rowcount)
 
+    def test_bulk_update_table(self):
+        cr = self.env.cr
+        cr.execute("CREATE TABLE _test_bulk_update(id int PRIMARY KEY, name varchar)")
+        cr.execute("INSERT INTO _test_bulk_update SELECT s, 'x' FROM generate_series(1, 4) s")
+        values = [(1, "a\tb"), (2, "c\\d\ne"), (3, None)]
+
+        for threshold in [0, 100]:
+            cr.execute("UPDATE _test_bulk_update SET name = 'x'")
+            with mock.patch.object(util.pg, "_BULK_COPY_THRESHOLD", threshold):
+                util.bulk_update_table(cr, "_test_bulk_update", "name", values)
+            cr.execute("SELECT id, name FROM _test_bulk_update ORDER BY id")
+            self.assertEqual(cr.fetchall(), [*values, (4, "x")])
+
+    def test_remove_columns(self):
+        cr = self.env.cr
+        cr.execute("CREATE TABLE _test_remove_columns(id int PRIMARY KEY, a int, b int, c int)")
+        stable = util.pg._STABLE_COLUMNS | {("_test_remove_columns", "a"), ("_test_remove_columns", "b")}
+
+        with mock.patch.object(util.pg, "_STABLE_COLUMNS", stable):
+            # memoize them
+            self.assertTrue(util.pg._column_exists_cached(cr, "_test_remove_columns", "a"))
+            self.assertTrue(util.pg._column_exists_cached(cr, "_test_remove_columns", "b"))
+
+            util.pg._remove_columns(cr, "_test_remove_columns", ["a", "b", "missing"])
+
+            self.assertFalse(util.pg._column_exists_cached(cr, "_test_remove_columns", "a"))
+            self.assertFalse(util.pg._column_exists_cached(cr, "_test_remove_columns", "b"))
+
+        self.assertEqual(list(util.get_columns(cr, "_test_remove_columns").iter_unquoted()), ["c"])
+
     def test_create_column_with_fk(self):
         cr = self.env.cr
         self.assertFalse(util.column_exists(cr, "res_partner", "_test_lang_id"))
@@ -790,6 +821,104 @@ class TestPG(UnitTestCase):
         self.assertEqual(target, ("res_lang", "id", "res_partner__test_lang_id_fkey"))
 
 
+class TestModules(UnitTestCase):
+    def test_force_install_module(self):
+        cr = self.env.cr
+        util.new_module(cr, "_test_fim_dep", deps={"base"})
+        util.new_module(cr, "_test_fim_mod", deps={"_test_fim_dep"})
+        util.new_module(cr, "_test_fim_other", deps={"base"})
+        util.new_module(cr, "_test_fim_auto", deps={"_test_fim_mod", "base"}, auto_install=True)
+        util.new_module(cr, "_test_fim_auto2", deps={"_test_fim_auto"}, auto_install=True)
+        util.new_module(cr, "_test_fim_noauto", deps={"_test_fim_mod", "_test_fim_other"}, auto_install=True)
+
+        with mock.patch.object(util.modules, "NO_AUTOINSTALL", False):
+            state = util.force_install_module(cr, "_test_fim_mod")
+        self.assertEqual(state, "to install")
+
+        expected = {
+            "_test_fim_dep": "to install",
+            "_test_fim_mod": "to install",
+            "_test_fim_other": "uninstalled",
+            # auto installed, on two dependency levels
+            "_test_fim_auto": "to install",
+            "_test_fim_auto2": "to install",
+            # one of its dependencies is not installed
+            "_test_fim_noauto": "uninstalled",
+        }
+        cr.execute("SELECT name, state FROM ir_module_module WHERE name = ANY(%s)", [list(expected)])
+        self.assertEqual(dict(cr.fetchall()), expected)
+
+
+class TestFields(UnitTestCase):
+    def _setup_inherits_chain(self):
+        cr = self.env.cr
+        models = ["_test_upg.parent", "_test_upg.child", "_test_upg.grandchild"]
+        for model in models:
+            cr.execute(
+                util.format_query(cr, "CREATE TABLE {}(id serial PRIMARY KEY, old_name int)", model.replace(".", "_"))
+            )
+            self.addCleanup(util.ENVIRON["__renamed_fields"].pop, model, None)
+
+        born = util.parse_version("7.0")
+        data = {
+            parent: [util.inherit.Inherit(model=child, born=born, dead=None, via="parent_id")]
+            for parent, child in zip(models, models[1:])
+        }
+        patcher = mock.patch.object(util.inherit, "_get_inheritance_data", return_value=data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return models
+
+    def test_rename_field_inherits(self):
+        cr = self.env.cr
+        models = self._setup_inherits_chain()
+        self.assertEqual(util.inherit._collect_inherits(cr, models[0]), models[1:])
+
+        util.rename_field(cr, models[0], "old_name", "new_name", update_references=False)
+        for model in models:
+            table = model.replace(".", "_")
+            self.assertFalse(util.column_exists(cr, table, "old_name"))
+            self.assertTrue(util.column_exists(cr, table, "new_name"))
+
+    def test_remove_field_inherits(self):
+        cr = self.env.cr
+        models = self._setup_inherits_chain()
+
+        util.remove_field(cr, models[0], "old_name")
+        for model in models:
+            self.assertFalse(util.column_exists(cr, model.replace(".", "_"), "old_name"))
+
+
+class TestModels(UnitTestCase):
+    def test_remove_inherit_from_model_shared_field(self):
+        cr = self.env.cr
+        # the mixin and its parent both define the stored field `x_shared`
+        for model, fields in [
+            ("x_test_parent", ["x_shared"]),
+            ("x_test_mixin", ["x_shared", "x_mixin_only"]),
+            ("x_test_target", ["x_shared", "x_mixin_only", "x_own"]),
+        ]:
+            self.env["ir.model"].create(
+                {
+                    "name": model,
+                    "model": model,
+                    "field_id": [(0, 0, {"name": name, "ttype": "char"}) for name in fields],
+                }
+            )
+
+        data = {
+            "x_test_parent": [
+                util.inherit.Inherit(model="x_test_mixin", born=util.parse_version("7.0"), dead=None, via=None)
+            ]
+        }
+        with mock.patch.object(util.inherit, "_get_inheritance_data", return_value=data):
+            util.remove_inherit_from_model(cr, "x_test_target", "x_test_mixin")
+
+        self.assertFalse(util.column_exists(cr, "x_test_target", "x_shared"))
+        self.assertFalse(util.column_exists(cr, "x_test_target", "x_mixin_only"))
+        self.assertTrue(util.column_exists(cr, "x_test_target", "x_own"))
+
+
 class TestORM(UnitTestCase):
     def test_create_cron(self):
         cr = self.env.cr
@@ -928,6 +1057,39 @@ class TestNamedCursors(UnitTestCase):
         self.assertEqual(result, expected)
 
 
+class TestData(UnitTestCase):
+    def test_split_group(self):
+        cr = self.env.cr
+        g1, g2, to_group = (self.env["res.groups"].create({"name": "_test_split_%s" % i}).id for i in range(3))
+        both, only_one = (
+            self.env["res.users"].create({"name": login, "login": login}).id for login in ["_test_both", "_test_one"]
+        )
+        cr.execute(
+            "INSERT INTO res_groups_users_rel(uid, gid) VALUES (%s, %s), (%s, %s), (%s, %s)",
+            [both, g1, both, g2, only_one, g1],
+        )
+
+        util.split_group(cr, [g1, g2], to_group)
+
+        cr.execute("SELECT uid FROM res_groups_users_rel WHERE gid = %s", [to_group])
+        self.assertEqual(cr.fetchall(), [(both,)])
+
+
+class TestAccounting(UnitTestCase):
+    def test_no_fiscal_lock(self):
+        cr = self.env.cr
+        util.create_column(cr, "res_company", "_test_lock_date", "date")
+        cr.execute("UPDATE res_company SET _test_lock_date = '2020-01-01'::date + id RETURNING id, _test_lock_date")
+        expected = sorted(cr.fetchall())
+
+        with no_fiscal_lock(cr):
+            cr.execute("SELECT 1 FROM res_company WHERE _test_lock_date IS NOT NULL")
+            self.assertFalse(cr.rowcount)
+
+        cr.execute("SELECT id, _test_lock_date FROM res_company ORDER BY id")
+        self.assertEqual(cr.fetchall(), expected)
+
+
 class TestRecords(UnitTestCase):
     def test_rename_xmlid(self):
         cr = self.env.cr
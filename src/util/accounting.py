@@ -2,6 +2,8 @@
 import logging
 from contextlib import contextmanager
 
+from psycopg2.extras import execute_values
+
 from .fields import remove_field
 from .helpers import table_of_model
 from .modules import module_installed
@@ -52,13 +54,16 @@ def no_fiscal_lock(cr):
     )
     data = cr.fetchall()
     yield
-    set_val = ", ".join("{} = %s".format(col) for col in columns)
-    cr.executemany(
+    # restore all the companies at once; the `::date` casts type the NULLs of the VALUES list
+    set_val = ", ".join("{0} = v.{0}::date".format(col) for col in columns)
+    execute_values(
+        cr._obj,
         """
-            UPDATE res_company
+            UPDATE res_company c
                SET {}
-             WHERE id = %s
-        """.format(set_val),
+              FROM (VALUES %s) AS v({}, id)
+             WHERE c.id = v.id
+        """.format(set_val, ", ".join(columns)),
         data,
     )
 
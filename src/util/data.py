@@ -25,28 +25,34 @@ def uniq_tags(cr, model, uniq_column="name", order="id"):
     you can prioritize tags in CamelCase/UPPERCASE.
     """
     table = table_of_model(cr, model)
+    fks = get_fk(cr, table)
+    m2m_tables = set()
+    m2o_fields = set()
+    if fks:
+        cr.execute(
+            """
+            SELECT relation_table, NULL
+              FROM ir_model_fields
+             WHERE ttype = 'many2many'
+               AND relation_table IN %s
+             UNION
+            SELECT model, name
+              FROM ir_model_fields
+             WHERE ttype = 'many2one'
+               AND name IN %s
+            """,
+            [tuple({ft for ft, _, _, _ in fks}), tuple({fc for _, fc, _, _ in fks})],
+        )
+        rows = cr.fetchall()
+        m2m_tables = {t for t, n in rows if n is None}
+        m2o_fields = {(m, n) for m, n in rows if n is not None}
+
     upds = []
-    for ft, fc, _, da in get_fk(cr, table):
+    for ft, fc, _, da in fks:
         cols = get_columns(cr, ft, ignore=(fc,))
-        is_many2one = False
-        is_many2many = da == "c" and len(cols) == 1  # if ondelete=cascade fk and only 2 columns, it's a m2m
-        if not is_many2many:
-            cr.execute("SELECT count(*) FROM ir_model_fields WHERE ttype = 'many2many' AND relation_table = %s", [ft])
-            [is_many2many] = cr.fetchone()
-        if not is_many2many:
-            f_model = model_of_table(cr, ft)
-            if f_model:
-                cr.execute(
-                    """
-                        SELECT count(*)
-                          FROM ir_model_fields
-                         WHERE model = %s
-                           AND name = %s
-                           AND ttype = 'many2one'
-                    """,
-                    [f_model, fc],
-                )
-                [is_many2one] = cr.fetchone()
+        # if ondelete=cascade fk and only 2 columns, it's a m2m
+        is_many2many = (da == "c" and len(cols) == 1) or ft in m2m_tables
+        is_many2one = not is_many2many and (model_of_table(cr, ft), fc) in m2o_fields
         assert is_many2many or is_many2one, (
             "Can't determine if column `%s` of table `%s` is a many2one or many2many" % (fc, ft)
         )
@@ -112,7 +118,7 @@ def split_group(cr, from_groups, to_group):
     if not isinstance(from_groups, (list, tuple, set)):
         from_groups = [from_groups]
 
-    from_groups = [g for g in map(check_group, from_groups) if g]
+    from_groups = list({g for g in map(check_group, from_groups) if g})
     if not from_groups:
         return
 
@@ -126,14 +132,15 @@ def split_group(cr, from_groups, to_group):
         INSERT INTO res_groups_users_rel(uid, gid)
              SELECT uid, %s
                FROM res_groups_users_rel
+              WHERE gid = ANY(%s)
            GROUP BY uid
-             HAVING array_agg(gid) @> %s
+             HAVING count(DISTINCT gid) = %s
              EXCEPT
              SELECT uid, gid
                FROM res_groups_users_rel
               WHERE gid = %s
     """,
-        [to_group, from_groups, to_group],
+        [to_group, from_groups, len(from_groups), to_group],
     )
 
 
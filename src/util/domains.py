@@ -36,7 +36,7 @@ from .const import NEARLYWARN
 from .helpers import _dashboard_actions, _validate_model, resolve_model_fields_path
 from .inherit import for_each_inherit
 from .misc import SelfPrintEvalContext
-from .pg import column_exists, get_value_or_en_translation, table_exists
+from .pg import _column_exists_cached, bulk_update_table, column_exists, get_value_or_en_translation, table_exists
 from .records import edit_view
 
 # python3 shims
@@ -369,23 +369,22 @@ def adapt_domains(cr, model, old, new, adapter=None, skip_inherit=(), force_adap
         """.format(df=df),
             [match_old],
         )
+        new_domains = []
         for id_, model, domain in cr.fetchall():  # noqa: PLR1704
             new_domain = _adapt_one_domain(
                 cr, target_model, old, new, model, domain, adapter=adapter, force_adapt=force_adapt
             )
             if new_domain:
-                cr.execute(
-                    "UPDATE {df.table} SET {df.domain_column} = %s WHERE id = %s".format(df=df),
-                    [unicode(new_domain), id_],
-                )
+                new_domains.append((id_, unicode(new_domain)))
+        bulk_update_table(cr, df.table, df.domain_column, new_domains)
 
     # adapt search views
     arch_db = (
         get_value_or_en_translation(cr, "ir_ui_view", "arch_db")
-        if column_exists(cr, "ir_ui_view", "arch_db")
+        if _column_exists_cached(cr, "ir_ui_view", "arch_db")
         else "arch"
     )
-    active_col = "active" if column_exists(cr, "ir_ui_view", "active") else "true"
+    active_col = "active" if _column_exists_cached(cr, "ir_ui_view", "active") else "true"
     cr.execute("SELECT id, model, {} FROM ir_ui_view WHERE {} ~ %s".format(active_col, arch_db), [match_old])
     for view_id, view_model, view_active in cr.fetchall():
         # Note: active=None is important to not reactivate views!
@@ -13,10 +13,11 @@ import json
 import logging
 import re
 import warnings
+from ast import literal_eval
 
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
 
 try:
     from odoo import release
@@ -41,11 +42,14 @@ from .const import ENVIRON
 from .domains import _adapt_one_domain, _replace_path, _valid_path_to, adapt_domains
 from .exceptions import SleepyDeveloperError
 from .helpers import _dashboard_actions, _validate_model, resolve_model_fields_path, table_of_model
-from .inherit import for_each_inherit
+from .inherit import _collect_inherits, for_each_inherit
 from .misc import SelfPrintEvalContext, log_progress, version_gte
 from .orm import env, invalidate
 from .pg import (
+    _column_exists_cached,
+    _forget_columns,
     alter_column_type,
+    bulk_update_table,
     column_exists,
     column_type,
     explode_query_range,
@@ -78,6 +82,10 @@ _CONTEXT_KEYS_TO_CLEAN = (
     "graph_groupbys",
     "orderedBy",
 )
+# contexts not matching this can't be changed by `clean_context`, no need to evaluate them
+_CONTEXT_KEYS_TO_CLEAN_RE = re.compile(
+    r"\b(?:{}|(?:pivot|graph|cohort)_measure)\b".format("|".join(_CONTEXT_KEYS_TO_CLEAN))
+)
 
 
 def ensure_m2o_func_field_data(cr, src_table, column, dst_table):
@@ -94,13 +102,21 @@ def ensure_m2o_func_field_data(cr, src_table, column, dst_table):
     if not column_exists(cr, src_table, column):
         return
     cr.execute(
-        """
-            SELECT count(1)
-              FROM "{src_table}"
-             WHERE "{column}" NOT IN (SELECT id FROM "{dst_table}")
-        """.format(src_table=src_table, column=column, dst_table=dst_table)
+        format_query(
+            cr,
+            """
+            SELECT 1
+              FROM {src_table} s
+             WHERE s.{column} IS NOT NULL
+               AND NOT EXISTS(SELECT 1 FROM {dst_table} d WHERE d.id = s.{column})
+             LIMIT 1
+            """,
+            src_table=src_table,
+            column=column,
+            dst_table=dst_table,
+        )
     )
-    if cr.fetchone()[0]:
+    if cr.rowcount:
         remove_column(cr, src_table, column, cascade=True)
 
 
@@ -123,6 +139,10 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
 
     ENVIRON["__renamed_fields"][model][fieldname] = None
 
+    # same word-boundary match, for postgres and python
+    match = r"\y{}\y".format(fieldname)
+    match_re = re.compile(r"\b{}\b".format(re.escape(fieldname)))
+
     def filter_value(key, value):
         if key == "orderedBy" and isinstance(value, dict):
             res = {k: (filter_value(None, v) if k == "name" else v) for k, v in value.items()}
@@ -160,8 +180,12 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
         return changed
 
     # clean dashboard's contexts
-    for id_, action in _dashboard_actions(cr, r"\y{}\y".format(fieldname), model):
-        context = safe_eval(action.get("context", "{}"), SelfPrintEvalContext(), nocopy=True)
+    for id_, action in _dashboard_actions(cr, match, model):
+        # dashboards are matched on their whole arch, not only on this action's context
+        context_s = action.get("context", "")
+        if not (match_re.search(context_s) and _CONTEXT_KEYS_TO_CLEAN_RE.search(context_s)):
+            continue
+        context = safe_eval(context_s or "{}", SelfPrintEvalContext(), nocopy=True)
         changed = clean_context(context)
         action.set("context", unicode(context))
         if changed:
@@ -172,16 +196,20 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
     # clean filter's contexts
     cr.execute(
         "SELECT id, name, context FROM ir_filters WHERE model_id = %s AND context ~ %s",
-        [model, r"\y{}\y".format(fieldname)],
+        [model, match],
     )
+    filters_contexts = []
     for id_, name, context_s in cr.fetchall():
+        if not _CONTEXT_KEYS_TO_CLEAN_RE.search(context_s or ""):
+            continue
         context = safe_eval(context_s or "{}", SelfPrintEvalContext(), nocopy=True)
         changed = clean_context(context)
-        cr.execute("UPDATE ir_filters SET context = %s WHERE id = %s", [unicode(context), id_])
+        filters_contexts.append((id_, unicode(context)))
         if changed:
             add_to_migration_reports(("ir.filters", id_, name), "Filters/Dashboards")
+    bulk_update_table(cr, "ir_filters", "context", filters_contexts)
 
-    if column_exists(cr, "ir_filters", "sort"):
+    if _column_exists_cached(cr, "ir_filters", "sort"):
         cr.execute(
             """
                WITH to_update AS (
@@ -200,7 +228,7 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
                  FROM to_update t
                 WHERE f.id = t.id
             """,
-            [(fieldname, fieldname + " desc"), model, r"\y{}\y".format(fieldname)],
+            [(fieldname, fieldname + " desc"), model, match],
         )
 
     _remove_import_export_paths(cr, model, fieldname)
@@ -255,7 +283,7 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
             )
 
     # remove this field from dependencies of other fields
-    if column_exists(cr, "ir_model_fields", "depends"):
+    if _column_exists_cached(cr, "ir_model_fields", "depends"):
         cr.execute(
             "SELECT id,model,depends FROM ir_model_fields WHERE state='manual' AND depends ~ %s",
             [r"\m{}\M".format(fieldname)],
@@ -272,7 +300,7 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
                 cr.execute("UPDATE ir_model_fields SET depends=%s WHERE id=%s", [", ".join(parts) or None, id])
 
     # drop m2m table if needed
-    if drop_column and column_exists(cr, "ir_model_fields", "relation_table"):  # appears in version 9.0
+    if drop_column and _column_exists_cached(cr, "ir_model_fields", "relation_table"):  # appears in version 9.0
         # verify that there aren't any other m2m pointing to the relation table
         cr.execute(
             """
@@ -324,7 +352,7 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
         )
 
     # remove default values set for aliases
-    if column_exists(cr, "mail_alias", "alias_defaults"):
+    if _column_exists_cached(cr, "mail_alias", "alias_defaults"):
         cr.execute(
             """
             SELECT a.id, a.alias_defaults
@@ -333,18 +361,25 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
              WHERE m.model = %s
                AND a.alias_defaults ~ %s
         """,
-            [model, r"\y%s\y" % (fieldname,)],
+            [model, match],
         )
+        aliases_defaults = []
         for alias_id, defaults_s in cr.fetchall():
             try:
-                defaults = dict(safe_eval(defaults_s))  # XXX literal_eval should works.
-            except Exception:
-                continue
-            defaults.pop(fieldname, None)
-            cr.execute("UPDATE mail_alias SET alias_defaults = %s WHERE id = %s", [repr(defaults), alias_id])
+                defaults = dict(literal_eval(defaults_s))
+            except (ValueError, SyntaxError, TypeError):
+                # not a plain literal, fallback to a full evaluation
+                try:
+                    defaults = dict(safe_eval(defaults_s))
+                except Exception:
+                    continue
+            if fieldname in defaults:
+                del defaults[fieldname]
+                aliases_defaults.append((alias_id, repr(defaults)))
+        bulk_update_table(cr, "mail_alias", "alias_defaults", aliases_defaults)
 
     # if field was a binary field stored as attachment, clean them...
-    if column_exists(cr, "ir_attachment", "res_field"):
+    if _column_exists_cached(cr, "ir_attachment", "res_field"):
         parallel_execute(
             cr,
             explode_query_range(
@@ -361,9 +396,10 @@ def remove_field(cr, model, fieldname, cascade=False, drop_column=True, skip_inh
     if drop_column and table_exists(cr, table) and column_exists(cr, table, fieldname):
         remove_column(cr, table, fieldname, cascade=cascade)
 
-    # remove field on inherits
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        remove_field(cr, inh.model, fieldname, cascade=cascade, drop_column=drop_column, skip_inherit=skip_inherit)
+    # remove field on inherits, each inheriting model is processed once, even when reachable
+    # through several parents; `adapt_domains` above already went down the whole hierarchy.
+    for inh_model in _collect_inherits(cr, model, skip_inherit):
+        remove_field(cr, inh_model, fieldname, cascade=cascade, drop_column=drop_column, skip_inherit="*")
 
 
 def remove_field_metadata(cr, model, fieldname, skip_inherit=()):
@@ -379,17 +415,16 @@ def remove_field_metadata(cr, model, fieldname, skip_inherit=()):
     :meta private: exclude from online docs
     """
     _validate_model(model)
+    models = [model] + _collect_inherits(cr, model, skip_inherit)
 
     cr.execute(
         """
             DELETE FROM ir_model_data
                   WHERE model = 'ir.model.fields'
-                    AND res_id IN (SELECT id FROM ir_model_fields WHERE model=%s AND name=%s)
+                    AND res_id IN (SELECT id FROM ir_model_fields WHERE model IN %s AND name=%s)
         """,
-        [model, fieldname],
+        [tuple(models), fieldname],
     )
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        remove_field_metadata(cr, inh.model, fieldname, skip_inherit=skip_inherit)
 
 
 def move_field_to_module(cr, model, fieldname, old_module, new_module, skip_inherit=()):
@@ -408,27 +443,26 @@ def move_field_to_module(cr, model, fieldname, old_module, new_module, skip_inhe
                                           not to be moved, use `"*"` to skip all
     """
     _validate_model(model)
-    name = IMD_FIELD_PATTERN % (model.replace(".", "_"), fieldname)
-    try:
-        with savepoint(cr), mute_logger("openerp.sql_db", "odoo.sql_db"):
+    # move field on the model and its inherits
+    for m in [model] + _collect_inherits(cr, model, skip_inherit):
+        name = IMD_FIELD_PATTERN % (m.replace(".", "_"), fieldname)
+        try:
+            with savepoint(cr), mute_logger("openerp.sql_db", "odoo.sql_db"):
+                cr.execute(
+                    """
+                       UPDATE ir_model_data
+                          SET module = %s
+                        WHERE model = 'ir.model.fields'
+                          AND name = %s
+                          AND module = %s
+                """,
+                    [new_module, name, old_module],
+                )
+        except psycopg2.IntegrityError:
             cr.execute(
-                """
-                   UPDATE ir_model_data
-                      SET module = %s
-                    WHERE model = 'ir.model.fields'
-                      AND name = %s
-                      AND module = %s
-            """,
-                [new_module, name, old_module],
+                "DELETE FROM ir_model_data WHERE model = 'ir.model.fields' AND name = %s AND module = %s",
+                [name, old_module],
             )
-    except psycopg2.IntegrityError:
-        cr.execute(
-            "DELETE FROM ir_model_data WHERE model = 'ir.model.fields' AND name = %s AND module = %s",
-            [name, old_module],
-        )
-    # move field on inherits
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        move_field_to_module(cr, inh.model, fieldname, old_module, new_module, skip_inherit=skip_inherit)
 
 
 def rename_field(cr, model, old, new, update_references=True, domain_adapter=None, skip_inherit=()):
@@ -457,13 +491,87 @@ def rename_field(cr, model, old, new, update_references=True, domain_adapter=Non
     """
     _validate_model(model)
 
-    rf = ENVIRON["__renamed_fields"][model]
-    rf[new] = rf.pop(old, old)
+    # the field is renamed on the model and all its inheriting models at once
+    inherits = _collect_inherits(cr, model, skip_inherit)
+    models = [model] + inherits
+
+    for m in models:
+        rf = ENVIRON["__renamed_fields"][m]
+        rf[new] = rf.pop(old, old)
 
     if update_references:
-        # skip all inherit, they will be handled by the resursive call
+        # the `domain_adapter` only applies to the given model
         update_field_usage(cr, model, old, new, domain_adapter=domain_adapter, skip_inherit="*")
+        if inherits:
+            _update_field_usage_multi(cr, inherits, old, new, skip_inherit="*")
 
+    for m in models:
+        _rename_field_definition(cr, m, old, new, update_references, skip_inherit)
+
+    # the remaining updates only touch metadata tables, send them all at once
+    params = {"old": old, "new": new, "models": tuple(models)}
+
+    # Updates custom field relation name to match the renamed standard field during upgrade.
+    queries = [
+        """
+        UPDATE ir_model_fields
+           SET relation_field = %(new)s
+         WHERE relation IN %(models)s
+           AND relation_field = %(old)s
+           AND state = 'manual'
+        """
+    ]
+
+    if table_exists(cr, "ir_translation"):
+        params["translation_names"] = tuple("%s,%s" % (m, old) for m in models)
+        queries.append(
+            """
+           UPDATE ir_translation
+              SET name = left(name, -length(%(old)s)) || %(new)s
+            WHERE name IN %(translation_names)s
+              AND type in ('field', 'help', 'model', 'model_terms', 'selection')   -- ignore wizard_* translations
+            """
+        )
+
+    if _column_exists_cached(cr, "ir_attachment", "res_field"):
+        queries.append(
+            """
+            UPDATE ir_attachment
+               SET res_field = %(new)s
+             WHERE res_model IN %(models)s
+               AND res_field = %(old)s
+            """
+        )
+
+    if table_exists(cr, "ir_values"):
+        queries.append(
+            """
+            UPDATE ir_values
+               SET name = %(new)s
+             WHERE model IN %(models)s
+               AND name = %(old)s
+               AND key = 'default'
+            """
+        )
+
+    if column_type(cr, "mail_tracking_value", "field") == "varchar":
+        # From saas~13.1, column `field` is a m2o to the `ir.model.fields`
+        queries.append(
+            """
+            UPDATE mail_tracking_value v
+               SET field = %(new)s
+              FROM mail_message m
+             WHERE v.mail_message_id = m.id
+               AND m.model IN %(models)s
+               AND v.field = %(old)s
+            """
+        )
+
+    cr.execute(";\n".join(queries), params)
+
+
+def _rename_field_definition(cr, model, old, new, update_references, skip_inherit):
+    # rename the field in `ir_model_fields`, its xmlid, and its column
     try:
         with savepoint(cr):
             cr.execute("UPDATE ir_model_fields SET name=%s WHERE model=%s AND name=%s RETURNING id", (new, model, old))
@@ -496,89 +604,41 @@ def rename_field(cr, model, old, new, update_references=True, domain_adapter=Non
             """,
             [fid],
         )
-        try:
-            with savepoint(cr):
-                cr.execute("UPDATE ir_model_data SET name=%s WHERE model='ir.model.fields' AND res_id=%s", [name, fid])
-        except psycopg2.IntegrityError:
-            # duplicate key. May happen du to conflict between
-            # some_model.sub_id and some_model_sub.id
-            # (before saas~11.2, where pattern changed)
-            name = "%s_%s" % (name, fid)
-            cr.execute("UPDATE ir_model_data SET name=%s WHERE model='ir.model.fields' AND res_id=%s", [name, fid])
-        cr.execute("UPDATE ir_property SET name=%s WHERE fields_id=%s", [new, fid])
-    # Updates custom field relation name to match the renamed standard field during upgrade.
-    cr.execute(
-        """
-        UPDATE ir_model_fields
-           SET relation_field = %s
-         WHERE relation = %s
-           AND relation_field = %s
-           AND state = 'manual'
-    """,
-        [new, model, old],
-    )
-
-    if table_exists(cr, "ir_translation"):
-        cr.execute(
-            """
-           UPDATE ir_translation
-              SET name=%s
-            WHERE name=%s
-              AND type in ('field', 'help', 'model', 'model_terms', 'selection')   -- ignore wizard_* translations
-        """,
-            ["%s,%s" % (model, new), "%s,%s" % (model, old)],
-        )
-
-    if column_exists(cr, "ir_attachment", "res_field"):
-        cr.execute(
-            """
-            UPDATE ir_attachment
-               SET res_field = %s
-             WHERE res_model = %s
-               AND res_field = %s
-        """,
-            [new, model, old],
-        )
-
-    if table_exists(cr, "ir_values"):
-        cr.execute(
-            """
-            UPDATE ir_values
-               SET name = %s
-             WHERE model = %s
-               AND name = %s
-               AND key = 'default'
-        """,
-            [new, model, old],
-        )
-
-    if column_type(cr, "mail_tracking_value", "field") == "varchar":
-        # From saas~13.1, column `field` is a m2o to the `ir.model.fields`
+        # The name may already be taken in the module. May happen du to conflict between
+        # some_model.sub_id and some_model_sub.id (before saas~11.2, where pattern changed)
+        # In such case, suffix it with the field id.
         cr.execute(
             """
-            UPDATE mail_tracking_value v
-               SET field = %s
-              FROM mail_message m
-             WHERE v.mail_message_id = m.id
-               AND m.model = %s
-               AND v.field = %s
-          """,
-            [new, model, old],
+              WITH _upd_prop AS (
+                    UPDATE ir_property
+                       SET name = %(new)s
+                     WHERE fields_id = %(fid)s
+              )
+            UPDATE ir_model_data x
+               SET name = CASE WHEN EXISTS(SELECT 1
+                                             FROM ir_model_data o
+                                            WHERE o.module = x.module
+                                              AND o.name = %(name)s
+                                              AND o.id != x.id)
+                               THEN %(name)s || '_' || x.res_id
+                               ELSE %(name)s
+                           END
+             WHERE x.model = 'ir.model.fields'
+               AND x.res_id = %(fid)s
+            """,
+            {"new": new, "fid": fid, "name": name},
         )
 
     table = table_of_model(cr, model)
     # NOTE table_exists is needed to avoid altering views
     if table_exists(cr, table) and column_exists(cr, table, old):
         cr.execute('ALTER TABLE "{0}" RENAME COLUMN "{1}" TO "{2}"'.format(table, old, new))
+        _forget_columns(cr, table, old)
         # Rename corresponding index
         new_index_name = make_index_name(table, new)
         old_index_name = make_index_name(table, old)
         cr.execute('ALTER INDEX IF EXISTS "{0}" RENAME TO "{1}"'.format(new_index_name, old_index_name))
 
-    # rename field on inherits
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        rename_field(cr, inh.model, old, new, update_references=update_references, skip_inherit=skip_inherit)
-
 
 def convert_field_to_html(cr, model, field, skip_inherit=()):
     _validate_model(model)
@@ -627,8 +687,9 @@ def convert_field_to_html(cr, model, field, skip_inherit=()):
         """,
         [field, model],
     )
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        convert_field_to_html(cr, inh.model, field, skip_inherit=skip_inherit)
+    # convert on inherits only once, even when they are reachable through several parents
+    for inh_model in _collect_inherits(cr, model, skip_inherit):
+        convert_field_to_html(cr, inh_model, field, skip_inherit="*")
 
 
 def convert_field_to_property(
@@ -712,6 +773,19 @@ def convert_field_to_property(
             """.format(**locals()),
         )
 
+    # when the field has no property yet (the usual case), there is nothing to deduplicate against
+    cr.execute("SELECT 1 FROM ir_property WHERE fields_id = %s LIMIT 1", [fields_id])
+    if cr.rowcount:
+        where_not_exists = """
+             WHERE NOT EXISTS(SELECT 1
+                                FROM ir_property
+                               WHERE fields_id=%(fields_id)s
+                                 AND company_id IS NOT DISTINCT FROM cte.company
+                                 AND res_id=cte.res_id)
+        """
+    else:
+        where_not_exists = ""
+
     cr.execute(
         """
         WITH cte AS (
@@ -723,11 +797,7 @@ def convert_field_to_property(
         INSERT INTO ir_property(name, type, fields_id, company_id, res_id, {value_field})
             SELECT %(field)s, %(type)s, %(fields_id)s, cte.company, cte.res_id, cte.value
               FROM cte
-             WHERE NOT EXISTS(SELECT 1
-                                FROM ir_property
-                               WHERE fields_id=%(fields_id)s
-                                 AND company_id IS NOT DISTINCT FROM cte.company
-                                 AND res_id=cte.res_id)
+            {where_not_exists}
     """.format(**locals()),
         locals(),
     )
@@ -770,12 +840,18 @@ def convert_binary_field_to_attachment(cr, model, field, encoded=True, name_fiel
         field,
     )
 
-    cr.execute(format_query(cr, "SELECT count(*) FROM {} WHERE {} IS NOT NULL", table, field))
-    [count] = cr.fetchone()
+    # `octet_length` is read from the varlena header, values are not detoasted
+    cr.execute(format_query(cr, "SELECT count(*), sum(octet_length({0})) FROM {1} WHERE {0} IS NOT NULL", field, table))
+    [count, size] = cr.fetchone()
+    if not count:
+        # nothing to convert, free PG space
+        remove_column(cr, table, field)
+        return
 
     A = env(cr)["ir.attachment"]
     iter_cur = cr._cnx.cursor("fetch_binary")
-    iter_cur.itersize = 1
+    # binary values can be large, only fetch a few of them at a time unless they are small enough to be fetched at once
+    iter_cur.itersize = count if size <= 64 * 1024 * 1024 else 10
     iter_cur.execute(
         format_query(
             cr,
@@ -785,7 +861,24 @@ def convert_binary_field_to_attachment(cr, model, field, encoded=True, name_fiel
             table=table,
         )
     )
+
+    def link_attachments(att_rids):
+        execute_values(
+            cr._obj,
+            """
+               UPDATE ir_attachment a
+                  SET res_model = v.res_model,
+                      res_id = v.res_id,
+                      res_field = v.res_field
+                 FROM (VALUES %s) AS v(id, res_id, res_model, res_field)
+                WHERE a.id = v.id
+            """,
+            [(att_id, rid, model, field) for att_id, rid in att_rids],
+        )
+        invalidate(A)
+
     logger = _logger.getChild("convert_binary_field_to_attachment")
+    att_rids = []
     for rid, data, name in log_progress(iter_cur, logger=logger, qualifier="rows", size=count):
         # we can't save create the attachment with res_model & res_id as it will fail computing
         # `res_name` field for non-loaded models. Store it naked and change it via SQL after.
@@ -796,17 +889,12 @@ def convert_binary_field_to_attachment(cr, model, field, encoded=True, name_fiel
         if not encoded:
             data = base64.b64encode(data)  # noqa: PLW2901
         att = A.create({"name": name, "datas": data, "type": "binary"})
-        cr.execute(
-            """
-               UPDATE ir_attachment
-                  SET res_model = %s,
-                      res_id = %s,
-                      res_field = %s
-                WHERE id = %s
-            """,
-            [model, rid, field, att.id],
-        )
-        invalidate(att)
+        att_rids.append((att.id, rid))
+        if len(att_rids) >= 100:
+            link_attachments(att_rids)
+            att_rids = []
+    if att_rids:
+        link_attachments(att_rids)
 
     iter_cur.close()
     # free PG space
@@ -855,14 +943,27 @@ def change_field_selection_values(cr, model, field, mapping, skip_inherit=()):
     _validate_model(model)
     if not mapping:
         return
-    table = table_of_model(cr, model)
-
-    if column_exists(cr, table, field):
-        query = "UPDATE {table} SET {field}= %s::jsonb->>{field} WHERE {field} IN %s".format(table=table, field=field)
-        queries = [
-            cr.mogrify(q, [json.dumps(mapping), tuple(mapping)]).decode()
-            for q in explode_query_range(cr, query, table=table)
-        ]
+    # the field is updated on the model and all its inheriting models at once
+    models = [model] + _collect_inherits(cr, model, skip_inherit)
+
+    # render the mapping only once, all the bucketed queries share the same literals
+    json_mapping = sql.Literal(json.dumps(mapping))
+    old_values = sql.Literal(tuple(mapping))
+    queries = []
+    for table in {table_of_model(cr, m) for m in models}:
+        if column_exists(cr, table, field):
+            query = format_query(
+                cr,
+                "UPDATE {table} SET {field} = {mapping}::jsonb->>{field} WHERE {field} IN {values}",
+                table=table,
+                field=field,
+                mapping=json_mapping,
+                values=old_values,
+            )
+            # escape the braces of the json literal from `explode_query_range` formatting
+            query = query.replace("{", "{{").replace("}", "}}")
+            queries.extend(explode_query_range(cr, query, table=table))
+    if queries:
         parallel_execute(cr, queries)
 
     cr.execute(
@@ -870,11 +971,11 @@ def change_field_selection_values(cr, model, field, mapping, skip_inherit=()):
         DELETE FROM ir_model_fields_selection s
               USING ir_model_fields f
               WHERE f.id = s.field_id
-                AND f.model = %s
+                AND f.model IN %s
                 AND f.name = %s
                 AND s.value IN %s
         """,
-        [model, field, tuple(mapping)],
+        [tuple(models), field, tuple(mapping)],
     )
 
     def adapter(leaf, _or, _neg):
@@ -885,12 +986,8 @@ def change_field_selection_values(cr, model, field, mapping, skip_inherit=()):
             right = mapping.get(right, right)
         return [(left, op, right)]
 
-    # skip all inherit, they will be handled by the resursive call
-    adapt_domains(cr, model, field, field, adapter=adapter, skip_inherit="*")
-
-    # rename field on inherits
-    for inh in for_each_inherit(cr, model, skip_inherit):
-        change_field_selection_values(cr, inh.model, field, mapping=mapping, skip_inherit=skip_inherit)
+    for m in models:
+        adapt_domains(cr, m, field, field, adapter=adapter, skip_inherit="*")
 
 
 def is_field_anonymized(cr, model, field):
@@ -1023,8 +1120,11 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
         "old": r"\y%s\y" % (re.escape(old),),
         "old_pattern": r"""[.'"]{0}\y""".format(re.escape(old)),
         "new": new,
-        "def_old": r"\ydefault_%s\y" % (re.escape(old),),
-        "def_new": "default_%s" % (new,),
+        # both `old` and `default_old` at once, the prefix is kept by the replacement
+        "any_old": r"\y(default_)?%s\y" % (re.escape(old),),
+        "any_new": r"\1%s" % (new,),
+        # cheap substring prefilter, evaluated before the regexes
+        "old_like": "%{}%".format(old.replace("_", r"\_")),
         "models": tuple(only_models) if only_models else (),
     }
 
@@ -1039,6 +1139,7 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
               JOIN ir_model m
                 ON a.model_id = m.id
              WHERE a.state = 'object_write'
+               AND a.update_path LIKE %(old_like)s
                AND a.update_path ~ %(old)s
             """,
             p,
@@ -1067,8 +1168,8 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
         SELECT id, {name}
           FROM ir_act_server
          WHERE state = 'code'
-           AND (code ~ %(old_pattern)s
-                {col_prefix} OR condition ~ %(old)s
+           AND (code LIKE %(old_like)s AND code ~ %(old_pattern)s
+                {col_prefix} OR condition LIKE %(old_like)s AND condition ~ %(old)s
                )
     """
 
@@ -1098,14 +1199,12 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
     if "." not in old and "." not in new:
         # ir.filters
         col_prefix = ""
-        if not column_exists(cr, "ir_filters", "sort"):
+        if not _column_exists_cached(cr, "ir_filters", "sort"):
             col_prefix = "--"  # sql comment the line
         q = """
             UPDATE ir_filters
                SET {col_prefix} sort = regexp_replace(sort, %(old)s, %(new)s, 'g'),
-                   context = regexp_replace(regexp_replace(context,
-                                                           %(old)s, %(new)s, 'g'),
-                                                           %(def_old)s, %(def_new)s, 'g')
+                   context = regexp_replace(context, %(any_old)s, %(any_new)s, 'g')
         """
 
         if only_models:
@@ -1114,19 +1213,15 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
             q += " WHERE "
         q += """
             (
-                context ~ %(old)s
-                OR context ~ %(def_old)s
-                {col_prefix} OR sort ~ %(old)s
+                context LIKE %(old_like)s AND context ~ %(any_old)s
+                {col_prefix} OR sort LIKE %(old_like)s AND sort ~ %(old)s
             )
         """
-        cr.execute(q.format(col_prefix=col_prefix), p)
-
-        # ir.exports.line, base_import.mapping # noqa
-        if only_models:
-            _update_impex_renamed_fields_paths(cr, old, new, only_models)
+        # the filters and aliases updates are sent at once
+        queries = [q.format(col_prefix=col_prefix)]
 
         # mail.alias
-        if column_exists(cr, "mail_alias", "alias_defaults"):
+        if _column_exists_cached(cr, "mail_alias", "alias_defaults"):
             q = """
                 UPDATE mail_alias a
                    SET alias_defaults = regexp_replace(a.alias_defaults, %(old)s, %(new)s, 'g')
@@ -1140,15 +1235,21 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
                 """
             else:
                 q += "WHERE "
-            q += "a.alias_defaults ~ %(old)s"
-            cr.execute(q, p)
+            q += "a.alias_defaults LIKE %(old_like)s AND a.alias_defaults ~ %(old)s"
+            queries.append(q)
+
+        cr.execute(";\n".join(queries), p)
+
+        # ir.exports.line, base_import.mapping # noqa
+        if only_models:
+            _update_impex_renamed_fields_paths(cr, old, new, only_models)
 
         # ir.ui.view.custom
         # adapt the context. The domain will be done by `adapt_domain`
         eval_context = SelfPrintEvalContext()
         def_old = "default_{}".format(old)
         def_new = "default_{}".format(new)
-        match = "{0[old]}|{0[def_old]}".format(p)
+        match = p["any_old"]
 
         def adapt_value(key, value):
             if key == "orderedBy" and isinstance(value, dict):
@@ -1159,13 +1260,12 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
                 # ignore if not a string
                 return value
 
-            parts = value.split(":", 1)
-            if parts[0] != old:
+            head, sep, tail = value.partition(":")
+            if head != old:
                 # if not match old, leave it
                 return value
             # change to new, and return it
-            parts[0] = new
-            return ":".join(parts)
+            return new + sep + tail
 
         def adapt_dict(d):
             # adapt (in place) dictionary values
@@ -1185,7 +1285,12 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
                     adapt_dict(d[vt])
 
         for _, act in _dashboard_actions(cr, match, *only_models or ()):
-            context = safe_eval(act.get("context", "{}"), eval_context, nocopy=True)
+            context_s = act.get("context", "{}")
+            try:
+                context = literal_eval(context_s)
+            except (ValueError, SyntaxError, TypeError):
+                # not a plain literal (e.g. references `uid`), fallback to a full evaluation
+                context = safe_eval(context_s, eval_context, nocopy=True)
             adapt_dict(context)
 
             if def_old in context:
@@ -1197,8 +1302,9 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
         for model in only_models:
             # skip all inherit, they will be handled by the resursive call
             adapt_domains(cr, model, old, new, adapter=domain_adapter, skip_inherit="*", force_adapt=True)
-            adapt_related(cr, model, old, new, skip_inherit="*")
-            adapt_depends(cr, model, old, new, skip_inherit="*")
+        # related and depends of all the models are adapted in a single pass over `ir_model_fields`
+        _adapt_related_multi(cr, only_models, old, new)
+        _adapt_depends_multi(cr, only_models, old, new)
 
         inherited_models = tuple(
             inh.model for model in only_models for inh in for_each_inherit(cr, model, skip_inherit)
@@ -1212,13 +1318,14 @@ def _update_field_usage_multi(cr, models, old, new, domain_adapter=None, skip_in
 def adapt_depends(cr, model, old, new, skip_inherit=()):
     # adapt depends for custom compute fields only. Standard fields will be updated by the ORM.
     _validate_model(model)
+    _adapt_depends_multi(cr, [model] + _collect_inherits(cr, model, skip_inherit), old, new)
 
-    if not column_exists(cr, "ir_model_fields", "depends"):
+
+def _adapt_depends_multi(cr, models, old, new):
+    if not _column_exists_cached(cr, "ir_model_fields", "depends"):
         # this field only appears in 9.0
         return
 
-    target_model = model
-
     match_old = r"\y{}\y".format(re.escape(old))
     cr.execute(
         """
@@ -1229,32 +1336,32 @@ def adapt_depends(cr, model, old, new, skip_inherit=()):
         """,
         [match_old],
     )
+    updates = []
     for id_, field_model, depends in cr.fetchall():
         temp_depends = depends.split(",")
         for i in range(len(temp_depends)):
-            domain = _adapt_one_domain(
-                cr, target_model, old, new, field_model, [(temp_depends[i], "=", "depends")], force_adapt=True
-            )
-            if domain:
-                temp_depends[i] = domain[0][0]
+            for target_model in models:
+                domain = _adapt_one_domain(
+                    cr, target_model, old, new, field_model, [(temp_depends[i], "=", "depends")], force_adapt=True
+                )
+                if domain:
+                    temp_depends[i] = domain[0][0]
         new_depends = ",".join(temp_depends)
         if new_depends != depends:
-            cr.execute("UPDATE ir_model_fields SET depends = %s WHERE id = %s", [new_depends, id_])
-
-    # down on inherits
-    for inh in for_each_inherit(cr, target_model, skip_inherit):
-        adapt_depends(cr, inh.model, old, new, skip_inherit=skip_inherit)
+            updates.append((id_, new_depends))
+    bulk_update_table(cr, "ir_model_fields", "depends", updates)
 
 
 def adapt_related(cr, model, old, new, skip_inherit=()):
     _validate_model(model)
+    _adapt_related_multi(cr, [model] + _collect_inherits(cr, model, skip_inherit), old, new)
+
 
+def _adapt_related_multi(cr, models, old, new):
     if not column_exists(cr, "ir_model_fields", "related"):
         # this field only appears in 9.0
         return
 
-    target_model = model
-
     match_old = r"\y{}\y".format(re.escape(old))
     cr.execute(
         """
@@ -1264,19 +1371,21 @@ def adapt_related(cr, model, old, new, skip_inherit=()):
         """,
         [match_old],
     )
+    updates = []
     for id_, field_model, related in cr.fetchall():
-        domain = _adapt_one_domain(
-            cr, target_model, old, new, field_model, [(related, "=", "related")], force_adapt=True
-        )
-        if domain:
-            cr.execute("UPDATE ir_model_fields SET related = %s WHERE id = %s", [domain[0][0], id_])
+        new_related = related
+        for target_model in models:
+            domain = _adapt_one_domain(
+                cr, target_model, old, new, field_model, [(new_related, "=", "related")], force_adapt=True
+            )
+            if domain:
+                new_related = domain[0][0]
+        if new_related != related:
+            updates.append((id_, new_related))
+    bulk_update_table(cr, "ir_model_fields", "related", updates)
 
     # TODO adapt paths in email templates?
 
-    # down on inherits
-    for inh in for_each_inherit(cr, target_model, skip_inherit):
-        adapt_related(cr, inh.model, old, new, skip_inherit=skip_inherit)
-
 
 def update_server_actions_fields(cr, src_model, dst_model=None, fields_mapping=None):
     """
@@ -1299,62 +1408,68 @@ def update_server_actions_fields(cr, src_model, dst_model=None, fields_mapping=N
             "at least dst_model or fields_mapping must be given to the move_field_references function."
         )
 
+    if fields_mapping is not None and not fields_mapping:
+        # nothing to move
+        return
+
     _dst_model = dst_model if dst_model is not None else src_model
 
     # update ir_server_object_lines to point to new fields
     if fields_mapping is None:
-        cr.execute(
-            """
-            WITH field_ids AS (
+        field_ids = """
                 SELECT mf1.id as old_field_id, mf2.id as new_field_id
                   FROM ir_model_fields mf1
                   JOIN ir_model_fields mf2 ON mf2.name = mf1.name
                  WHERE mf1.model = %s
                    AND mf2.model = %s
-            )
-               UPDATE ir_server_object_lines
-                  SET col1 = f.new_field_id
-                 FROM field_ids f
-                WHERE col1 = f.old_field_id
-            RETURNING server_id
-            """,
-            [src_model, _dst_model],
-        )
+        """
     else:
-        psycopg2.extras.execute_values(
-            cr._obj,
-            """
-            WITH field_ids AS (
+        field_ids = """
                 SELECT mf1.id as old_field_id, mf2.id as new_field_id
                   FROM (VALUES %s) AS mapping(src_model, dst_model, old_name, new_name)
                   JOIN ir_model_fields mf1 ON mf1.name = mapping.old_name AND mf1.model = mapping.src_model
                   JOIN ir_model_fields mf2 ON mf2.name = mapping.new_name AND mf2.model = mapping.dst_model
-            )
+        """
+    query = """
+        WITH field_ids AS ({field_ids}),
+        upd_lines AS (
                UPDATE ir_server_object_lines
                   SET col1 = f.new_field_id
                  FROM field_ids f
                 WHERE col1 = f.old_field_id
             RETURNING server_id
-            """,
-            [(src_model, _dst_model, fm[0], fm[1]) for fm in fields_mapping],
         )
-
-    # update ir_act_server records to point to the right model if set
-    if dst_model is not None and src_model != dst_model and cr.rowcount > 0:
-        action_ids = tuple({row[0] for row in cr.fetchall()})  # uniquify ids
-
-        cr.execute(
-            """
+    """
+    # update ir_act_server records to point to the right model if set, in the same statement
+    update_actions = dst_model is not None and src_model != dst_model
+    if update_actions:
+        query += """,
+        upd_actions AS (
                UPDATE ir_act_server
-                  SET model_name = %s, model_id = ir_model.id
+                  SET model_name = {dst_model}, model_id = ir_model.id
                  FROM ir_model
-                WHERE ir_model.model = %s
-                  AND ir_act_server.id IN %s
+                WHERE ir_model.model = {dst_model}
+                  AND ir_act_server.id IN (SELECT server_id FROM upd_lines)
             RETURNING ir_act_server.name
-            """,
-            [dst_model, dst_model, action_ids],
+        )
+        SELECT name FROM upd_actions
+        """
+    else:
+        query += "SELECT server_id FROM upd_lines"
+    query = format_query(cr, query, field_ids=sql.SQL(field_ids), dst_model=sql.Literal(dst_model))
+
+    if fields_mapping is None:
+        cr.execute(query, [src_model, _dst_model])
+    else:
+        mapping_values = [(src_model, _dst_model, fm[0], fm[1]) for fm in fields_mapping]
+        psycopg2.extras.execute_values(
+            cr._obj,
+            query,
+            mapping_values,
+            page_size=len(mapping_values),  # a single page, to be able to fetch all the returned rows
         )
 
+    if update_actions and cr.rowcount > 0:
         action_names = [row[0] for row in cr.fetchall()]
 
         # inform the customer through the chatter about this modification
@@ -7,7 +7,7 @@ from collections import namedtuple
 import lxml
 
 from .exceptions import SleepyDeveloperError
-from .misc import splitlines, version_between, version_gte
+from .misc import _cached, splitlines, version_between, version_gte
 
 _logger = logging.getLogger(__name__.rpartition(".")[0])
 
@@ -34,7 +34,12 @@ except NameError:
 
 
 def table_of_model(cr, model):
-    exceptions = dict(
+    return _table_of_model_exceptions().get(model, model.replace(".", "_"))
+
+
+@_cached
+def _table_of_model_exceptions():
+    return dict(
         line.split()
         for line in splitlines(
             """
@@ -72,11 +77,11 @@ def table_of_model(cr, model):
     """.format(gte_saas13_lte_saas14_3="" if version_gte("9.saas~13") and not version_gte("saas~14.3") else "#")
         )
     )
-    return exceptions.get(model, model.replace(".", "_"))
 
 
-def model_of_table(cr, table):
-    exceptions = dict(
+@_cached
+def _model_of_table_exceptions():
+    return dict(
         line.split()
         for line in splitlines(
             """
@@ -111,8 +116,11 @@ def model_of_table(cr, table):
             )
         )
     )
+
+
+def model_of_table(cr, table):
     try:
-        return exceptions[table]
+        return _model_of_table_exceptions()[table]
     except KeyError:
         cr.execute(
             """
@@ -175,37 +183,52 @@ def _ir_values_value(cr, prefix=None):
 
 def _dashboard_actions(cr, arch_match, *models):
     """Yield (dashboard_id, action) of dashboards that match `arch_match` and apply on `models` (if specified)."""
+    from .pg import bulk_update_table, named_cursor
+
     q = """
         SELECT id, arch
           FROM ir_ui_view_custom
          WHERE arch ~ %s
     """
-    cr.execute(q, [arch_match])
-    for dash_id, arch in cr.fetchall():
-        try:
-            if isinstance(arch, unicode):
-                arch = arch.encode("utf-8")  # noqa: PLW2901
-            dash = lxml.etree.fromstring(arch)
-        except lxml.etree.XMLSyntaxError:
-            _logger.exception("Cannot parse dashboard %s", dash_id)
-            continue
-        for act in dash.xpath("//action"):
-            if models:
+    archs = []
+    act_models = {}
+    # dashboards are streamed, only a bounded number of archs is held in memory
+    try:
+        with named_cursor(cr, itersize=100) as ncr:
+            ncr.execute(q, [arch_match])
+            for dash_id, arch in ncr:
                 try:
-                    act_id = int(act.get("name", "FAIL"))
-                except ValueError:
-                    continue
-
-                cr.execute("SELECT res_model FROM ir_act_window WHERE id = %s", [act_id])
-                [act_model] = cr.fetchone() or [None]
-                if act_model not in models:
+                    if isinstance(arch, unicode):
+                        arch = arch.encode("utf-8")  # noqa: PLW2901
+                    dash = lxml.etree.fromstring(arch)
+                except lxml.etree.XMLSyntaxError:
+                    _logger.exception("Cannot parse dashboard %s", dash_id)
                     continue
-            yield dash_id, act
-
-        cr.execute(
-            "UPDATE ir_ui_view_custom SET arch = %s WHERE id = %s",
-            [lxml.etree.tostring(dash, encoding="unicode"), dash_id],
-        )
+                for act in dash.xpath("//action"):
+                    if models:
+                        try:
+                            act_id = int(act.get("name", "FAIL"))
+                        except ValueError:
+                            continue
+
+                        if act_id not in act_models:
+                            cr.execute("SELECT res_model FROM ir_act_window WHERE id = %s", [act_id])
+                            [act_models[act_id]] = cr.fetchone() or [None]
+                        if act_models[act_id] not in models:
+                            continue
+                    yield dash_id, act
+
+                archs.append((dash_id, lxml.etree.tostring(dash, encoding="unicode")))
+                if len(archs) >= 1000:
+                    bulk_update_table(cr, "ir_ui_view_custom", "arch", archs)
+                    archs = []
+    except GeneratorExit:
+        # the caller stopped iterating early, still write the processed dashboards;
+        # on any other error, nothing more is written
+        bulk_update_table(cr, "ir_ui_view_custom", "arch", archs)
+        raise
+
+    bulk_update_table(cr, "ir_ui_view_custom", "arch", archs)
 
 
 def _get_theme_models():
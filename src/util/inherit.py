@@ -93,6 +93,20 @@ def for_each_inherit(cr, model, skip=(), interval="[)"):
             yield inh
 
 
+def _collect_inherits(cr, model, skip=(), interval="[)"):
+    """Return the names of all the models inheriting from `model`, recursively, breadth first."""
+    result = []
+    seen = {model}
+    queue = [model]
+    while queue:
+        for inh in for_each_inherit(cr, queue.pop(0), skip, interval):
+            if inh.model not in seen:
+                seen.add(inh.model)
+                result.append(inh.model)
+                queue.append(inh.model)
+    return result
+
+
 def direct_inherit_parents(cr, model, skip=(), interval="[)"):
     """Yield the *direct* inherits parents."""
     if skip == "*":
@@ -8,6 +8,9 @@ Model operations are best done in `pre-` script of the involved modules.
 import json
 import logging
 import re
+from collections import OrderedDict
+
+from psycopg2.extras import execute_values
 
 from .const import ENVIRON
 from .fields import IMD_FIELD_PATTERN, remove_field
@@ -16,7 +19,9 @@ from .indirect_references import indirect_references
 from .inherit import for_each_inherit, inherit_parents
 from .misc import _cached, chunks, log_progress
 from .pg import (
-    _get_unique_indexes_with,
+    _column_exists_cached,
+    _get_unique_indexes_of,
+    _remove_columns,
     column_exists,
     column_type,
     column_updatable,
@@ -39,20 +44,26 @@ _logger = logging.getLogger(__name__)
 
 @_cached
 def _unknown_model_id(cr):
-    order = column_exists(cr, "ir_model", "order")
+    order = _column_exists_cached(cr, "ir_model", "order")
     extra_columns = ', "order"' if order else ""
     extra_values = ", 'id'" if order else ""
     name_value = (
         "jsonb_build_object('en_US', 'Unknown')" if column_type(cr, "ir_model", "name") == "jsonb" else "'Unknown'"
     )
+    # both parts see the same snapshot: the id comes either from the insert or from the existing record
     cr.execute(
         """
-            INSERT INTO ir_model(name, model{})
-                 SELECT {}, '_unknown'{}
-                  WHERE NOT EXISTS (SELECT 1 FROM ir_model WHERE model = '_unknown')
+            WITH ins AS (
+                INSERT INTO ir_model(name, model{})
+                     SELECT {}, '_unknown'{}
+                      WHERE NOT EXISTS (SELECT 1 FROM ir_model WHERE model = '_unknown')
+                  RETURNING id
+            )
+            SELECT id FROM ins
+             UNION ALL
+            SELECT id FROM ir_model WHERE model = '_unknown'
         """.format(extra_columns, name_value, extra_values)
     )
-    cr.execute("SELECT id FROM ir_model WHERE model = '_unknown'")
     return cr.fetchone()[0]
 
 
@@ -82,7 +93,7 @@ def remove_model(cr, model, drop_table=True, ignore_m2m=()):
 
         query = cr.mogrify(
             """
-                SELECT d.res_id
+                SELECT DISTINCT d.res_id
                   FROM ir_model_data d
                   JOIN "{}" r ON d.model = %s AND d.res_id = r.id
                  WHERE d.module != '__export__'
@@ -98,36 +109,48 @@ def remove_model(cr, model, drop_table=True, ignore_m2m=()):
 
         cr.execute(query)
         if ir.table == "ir_ui_view":
-            for (view_id,) in cr.fetchall():
-                remove_view(cr, view_id=view_id, silent=True)
+            view_ids = tuple(view_id for (view_id,) in cr.fetchall())
+            if view_ids:
+                # built-in children of a removed view are removed recursively by `remove_view`;
+                # only process the views that won't be removed by their parent.
+                cr.execute(
+                    """
+                    SELECT v.id
+                      FROM ir_ui_view v
+                     WHERE v.id IN %(ids)s
+                       AND NOT (
+                               COALESCE(v.inherit_id IN %(ids)s, false)
+                           AND EXISTS(SELECT 1
+                                        FROM ir_model_data x
+                                       WHERE x.model = 'ir.ui.view'
+                                         AND x.res_id = v.id
+                                         AND x.module !~ '^_')
+                           )
+                  ORDER BY v.id
+                    """,
+                    {"ids": view_ids},
+                )
+                for (view_id,) in cr.fetchall():
+                    remove_view(cr, view_id=view_id, silent=True)
         else:
             # remove in batch
             size = (cr.rowcount + chunk_size - 1) / chunk_size
             it = chunks([id for (id,) in cr.fetchall()], chunk_size, fmt=tuple)
             for sub_ids in log_progress(it, _logger, qualifier=ir.table, size=size):
+                # NOTE: `remove_records` already takes care of the references (`_rm_refs`)
                 remove_records(cr, ref_model, sub_ids)
-                _rm_refs(cr, ref_model, sub_ids)
 
         if ir.set_unknown:
-            # Link remaining records not linked to a XMLID
-            query = cr.mogrify(
-                'SELECT id FROM "{}" r WHERE {}'.format(ir.table, ir.model_filter(prefix="r.")), [model]
-            ).decode()
-            cr.execute(query)
-            ids = [id for (id,) in cr.fetchall()]
-            if ids:
-                # link to `_unknown` model
-                sets, args = zip(
-                    *[
-                        ('"{}" = %s'.format(c), v)
-                        for c, v in [(ir.res_model, "_unknown"), (ir.res_model_id, unk_id)]
-                        if c
-                    ]
-                )
-
-                query = 'UPDATE "{}" SET {} WHERE id IN %s'.format(ir.table, ",".join(sets))
-                cr.execute(query, args + (tuple(ids),))
-                notify = notify or bool(cr.rowcount)
+            # Link remaining records not linked to a XMLID to the `_unknown` model
+            sets, args = zip(
+                *[('"{}" = %s'.format(c), v) for c, v in [(ir.res_model, "_unknown"), (ir.res_model_id, unk_id)] if c]
+            )
+            # a single UPDATE on the current cursor, `remove_model` must not commit the caller's transaction
+            cr.execute(
+                'UPDATE "{}" r SET {} WHERE {}'.format(ir.table, ",".join(sets), ir.model_filter(prefix="r.")),
+                args + (model,),
+            )
+            notify = notify or bool(cr.rowcount)
 
     _remove_import_export_paths(cr, model)
 
@@ -168,33 +191,27 @@ def remove_model(cr, model, drop_table=True, ignore_m2m=()):
             """
                 DELETE
                   FROM ir_model_data x
-                 USING ir_rule a
-                 WHERE x.res_id = a.id
-                   AND x.model = 'ir.rule'
-                   AND a.model_id = %s
-        """,
-            [mod_id],
-        )
-        cr.execute(
-            """
-                DELETE
-                  FROM ir_model_data x
-                 USING ir_model_access a
+                 USING (SELECT 'ir.rule' AS model, id FROM ir_rule WHERE model_id = %(mod_id)s
+                         UNION ALL
+                        SELECT 'ir.model.access' AS model, id FROM ir_model_access WHERE model_id = %(mod_id)s
+                       ) a
                  WHERE x.res_id = a.id
-                   AND x.model = 'ir.model.access'
-                   AND a.model_id = %s
+                   AND x.model = a.model
         """,
-            [mod_id],
+            {"mod_id": mod_id},
         )
 
         cr.execute("DELETE FROM ir_model WHERE id=%s", (mod_id,))
 
-    cr.execute("DELETE FROM ir_model_data WHERE model=%s AND name=%s", ("ir.model", "model_%s" % model_underscore))
     cr.execute(
-        "DELETE FROM ir_model_data WHERE model='ir.model.fields' AND name LIKE %s",
-        [(IMD_FIELD_PATTERN % (model_underscore, "%")).replace("_", r"\_")],
+        """
+        DELETE FROM ir_model_data
+         WHERE (model = 'ir.model' AND name = %s)
+            OR (model = 'ir.model.fields' AND name LIKE %s)
+            OR model = %s
+        """,
+        ["model_%s" % model_underscore, (IMD_FIELD_PATTERN % (model_underscore, "%")).replace("_", r"\_"), model],
     )
-    cr.execute("DELETE FROM ir_model_data WHERE model = %s", [model])
     cr.execute("UPDATE ir_model_fields SET relation = '_unknown' WHERE relation = %s", [model])
 
     table = table_of_model(cr, model)
@@ -249,6 +266,8 @@ def rename_model(cr, old, new, rename_table=True):
         explode_execute(cr, query, table=table)
 
     # "model-comma" fields
+    # values are `old,id`; keep the part starting at the comma
+    start = len(old) + 1
     cr.execute(
         """
         SELECT model, name
@@ -262,89 +281,104 @@ def rename_model(cr, old, new, rename_table=True):
             query = cr.mogrify(
                 """
                     UPDATE "{table}"
-                       SET "{column}"='{new}' || substring("{column}" FROM '%#",%#"' FOR '#')
+                       SET "{column}"='{new}' || substr("{column}", {start})
                      WHERE "{column}" LIKE '{old},%'
-            """.format(table=table, column=column, new=new, old=old)
+            """.format(table=table, column=column, new=new, old=old, start=start)
             ).decode()
             explode_execute(cr, query, table=table)
 
+    # the remaining updates only touch metadata tables, send them all at once
+    queries = []
+
     # defaults
     if table_exists(cr, "ir_values"):
         column_read, cast_write = _ir_values_value(cr)
-        query = """
+        queries.append(
+            """
             UPDATE ir_values
-               SET value = {cast[0]}'{new}' || substring({column} FROM '%#",%#"' FOR '#'){cast[2]}
+               SET value = {cast[0]}'{new}' || substr({column}, {start}){cast[2]}
              WHERE {column} LIKE '{old},%'
-        """.format(column=column_read, new=new, old=old, cast=cast_write.partition("%s"))
-        cr.execute(query)
+            """.format(column=column_read, new=new, old=old, start=start, cast=cast_write.partition("%s"))
+        )
 
     # translations
     if table_exists(cr, "ir_translation"):
-        cr.execute(
+        queries.append(
             """
             WITH renames AS (
-                SELECT id, type, lang, res_id, src, '{new}' || substring(name FROM '%#",%#"' FOR '#') as new
+                SELECT id, type, lang, res_id, src, '{new}' || substr(name, {start}) as new
                   FROM ir_translation
                  WHERE name LIKE '{old},%'
+            ),
+            upd AS (
+                UPDATE ir_translation t
+                   SET name = r.new
+                  FROM renames r
+             LEFT JOIN ir_translation e ON (
+                    e.type = r.type
+                AND e.lang = r.lang
+                AND e.name = r.new
+                AND CASE WHEN e.type = 'model' THEN e.res_id IS NOT DISTINCT FROM r.res_id
+                         WHEN e.type = 'selection' THEN e.src IS NOT DISTINCT FROM r.src
+                         ELSE e.res_id IS NOT DISTINCT FROM r.res_id AND e.src IS NOT DISTINCT FROM r.src
+                     END
+             )
+                 WHERE t.id = r.id
+                   AND e.id IS NULL
+             RETURNING t.id
             )
-            UPDATE ir_translation t
-               SET name = r.new
-              FROM renames r
-         LEFT JOIN ir_translation e ON (
-                e.type = r.type
-            AND e.lang = r.lang
-            AND e.name = r.new
-            AND CASE WHEN e.type = 'model' THEN e.res_id IS NOT DISTINCT FROM r.res_id
-                     WHEN e.type = 'selection' THEN e.src IS NOT DISTINCT FROM r.src
-                     ELSE e.res_id IS NOT DISTINCT FROM r.res_id AND e.src IS NOT DISTINCT FROM r.src
-                 END
-         )
-             WHERE t.id = r.id
-               AND e.id IS NULL
-        """.format(new=new, old=old)
+            -- the translations that could not be renamed (duplicates) are removed
+            DELETE FROM ir_translation
+             WHERE id IN (SELECT id FROM renames EXCEPT SELECT id FROM upd)
+            """.format(new=new, old=old, start=start)
         )
-        cr.execute("DELETE FROM ir_translation WHERE name LIKE '{},%'".format(old))
-
-        cr.execute(
-            """
-            UPDATE ir_translation
-               SET name=%s
-             WHERE name=%s
-               AND type IN ('constraint', 'sql_constraint', 'view', 'report', 'rml', 'xsl')
-        """,
-            [new, old],
+        queries.append(
+            cr.mogrify(
+                """
+                UPDATE ir_translation
+                   SET name=%s
+                 WHERE name=%s
+                   AND type IN ('constraint', 'sql_constraint', 'view', 'report', 'rml', 'xsl')
+                """,
+                [new, old],
+            ).decode()
         )
 
     old_u = old.replace(".", "_")
     new_u = new.replace(".", "_")
 
-    cr.execute(
-        "UPDATE ir_model_data SET name=%s WHERE model=%s AND name=%s",
-        ("model_%s" % new_u, "ir.model", "model_%s" % old_u),
+    queries.append(
+        cr.mogrify(
+            "UPDATE ir_model_data SET name=%s WHERE model=%s AND name=%s",
+            ("model_%s" % new_u, "ir.model", "model_%s" % old_u),
+        ).decode()
     )
-
-    cr.execute(
-        """
+    queries.append(
+        cr.mogrify(
+            """
             UPDATE ir_model_data
                SET name=%s || substring(name from %s)
              WHERE model='ir.model.fields'
                AND name LIKE %s
-    """,
-        ["field_%s" % new_u, len(old_u) + 7, (IMD_FIELD_PATTERN % (old_u, "%")).replace("_", r"\_")],
+            """,
+            ["field_%s" % new_u, len(old_u) + 7, (IMD_FIELD_PATTERN % (old_u, "%")).replace("_", r"\_")],
+        ).decode()
     )
 
     col_prefix = ""
     if not column_exists(cr, "ir_act_server", "condition"):
         col_prefix = "--"  # sql comment the line
 
-    cr.execute(
+    queries.append(
         r"""
         UPDATE ir_act_server
            SET {col_prefix} condition=regexp_replace(condition, '([''"]){old}\1', '\1{new}\1', 'g'),
                code=regexp_replace(code, '([''"]){old}\1', '\1{new}\1', 'g')
-    """.format(col_prefix=col_prefix, old=old.replace(".", r"\."), new=new)
+        """.format(col_prefix=col_prefix, old=old.replace(".", r"\."), new=new)
     )
 
+    cr.execute(";\n".join(queries))
+
 
 def merge_model(cr, source, target, drop_table=True, fields_mapping=None, ignore_m2m=()):
     """
@@ -389,19 +423,18 @@ def merge_model(cr, source, target, drop_table=True, fields_mapping=None, ignore
     )
     field_ids_mapping = dict(cr.fetchall())
     if fields_mapping:
-        jmap = json.dumps(fields_mapping)
-        cr.execute(
+        execute_values(
+            cr._obj,
             """
             SELECT mf1.name,
                    mf1.id,
                    mf2.id
-              FROM ir_model_fields mf1
-              JOIN ir_model_fields mf2
-                ON mf1.model=%s
-               AND mf2.model=%s
-               AND mf2.name=(%s::jsonb ->> mf1.name::varchar)::varchar
+              FROM (VALUES %s) AS mapping(src_model, dst_model, old_name, new_name)
+              JOIN ir_model_fields mf1 ON mf1.name = mapping.old_name AND mf1.model = mapping.src_model
+              JOIN ir_model_fields mf2 ON mf2.name = mapping.new_name AND mf2.model = mapping.dst_model
             """,
-            [source, target, jmap],
+            [(source, target, s, t) for s, t in fields_mapping.items()],
+            page_size=len(fields_mapping),  # a single page, to be able to fetch all the results
         )
         explicit_mapping = {name: (id_s, id_t) for name, id_s, id_t in cr.fetchall()}
         field_ids_mapping.update(explicit_mapping.values())
@@ -432,28 +465,42 @@ def merge_model(cr, source, target, drop_table=True, fields_mapping=None, ignore
         ignores = ["ir_model_fields_group_rel", "ir_model_fields_selection"]
         replace_record_references_batch(cr, field_ids_mapping, "ir.model.fields", replace_xmlid=False, ignores=ignores)
 
-    for ir in indirect_references(cr):
-        if ir.res_model and not ir.res_id and ir.table not in ignores:
-            # only update unbound references, other ones have been updated by the call to
-            # `replace_record_references_batch`
-            wheres = []
-            for _, uniqs in _get_unique_indexes_with(cr, ir.table, ir.res_model):
-                sub_where = " AND ".join("o.{0} = t.{0}".format(a) for a in uniqs if a != ir.res_model) or "true"
-                wheres.append(
-                    "NOT EXISTS(SELECT 1 FROM {t} o WHERE {w} AND o.{c}=%(new)s)".format(
-                        t=ir.table, c=ir.res_model, w=sub_where
-                    )
+    irs = [ir for ir in indirect_references(cr) if ir.res_model and not ir.res_id and ir.table not in ignores]
+
+    # fetch the unique indexes of all the referencing tables at once, instead of one catalog query per table
+    unique_indexes = _get_unique_indexes_of(cr, *{ir.table for ir in irs})
+
+    queries = []
+    for ir in irs:
+        # only update unbound references, other ones have been updated by the call to
+        # `replace_record_references_batch`
+        cr.execute("SELECT 1 FROM {t} WHERE {c}=%s LIMIT 1".format(t=ir.table, c=ir.res_model), [source])
+        if not cr.rowcount:
+            continue
+        wheres = []
+        for _, uniqs in unique_indexes[ir.table]:
+            if ir.res_model not in uniqs:
+                continue
+            sub_where = " AND ".join("o.{0} = t.{0}".format(a) for a in uniqs if a != ir.res_model) or "true"
+            wheres.append(
+                "NOT EXISTS(SELECT 1 FROM {t} o WHERE {w} AND o.{c}=%(new)s)".format(
+                    t=ir.table, c=ir.res_model, w=sub_where
                 )
-            where = " AND ".join(wheres) or "true"
-            query = "UPDATE {t} t SET {c}=%(new)s WHERE {w} AND {c}=%(old)s".format(t=ir.table, c=ir.res_model, w=where)
-            fmt_query = cr.mogrify(query, {"new": target, "old": source}).decode()
-            if column_exists(cr, ir.table, "id"):
-                parallel_execute(cr, explode_query_range(cr, fmt_query, table=ir.table, alias="t"))
-            else:
-                cr.execute(fmt_query)
+            )
+        where = " AND ".join(wheres) or "true"
+        query = "UPDATE {t} t SET {c}=%(new)s WHERE {w} AND {c}=%(old)s".format(t=ir.table, c=ir.res_model, w=where)
+        fmt_query = cr.mogrify(query, {"new": target, "old": source}).decode()
+        if column_exists(cr, ir.table, "id"):
+            queries.extend(explode_query_range(cr, fmt_query, table=ir.table, alias="t"))
+        else:
+            cr.execute(fmt_query)
+
+    if queries:
+        # the referencing tables are independent, update them in parallel
+        parallel_execute(cr, queries)
 
     # adapt computes of manual fields
-    if column_exists(cr, "ir_model_fields", "compute"):
+    if _column_exists_cached(cr, "ir_model_fields", "compute"):
         cr.execute(
             r"""
             UPDATE ir_model_fields
@@ -502,7 +549,7 @@ def remove_inherit_from_model(cr, model, inherit, keep=(), skip_inherit=()):
 
     cr.execute(
         """
-        SELECT name, ttype, relation, store
+        SELECT DISTINCT name, ttype, relation, store
           FROM ir_model_fields
          WHERE model IN %s
            AND name NOT IN ('id',
@@ -513,14 +560,28 @@ def remove_inherit_from_model(cr, model, inherit, keep=(), skip_inherit=()):
     """,
         [tuple(inherit_models), list(keep)],
     )
-    for field, ftype, relation, store in cr.fetchall():
-        if ftype == "one2many" and store:
-            # for mixin, one2many are filtered by their model and res_id.
-            table = table_of_model(cr, relation)
-            irs = [ir for ir in indirect_references(cr) if ir.table == table and ir.res_id is not None]
-            for ir in irs:
-                query = 'DELETE FROM "{}" WHERE ({})'.format(ir.table, ir.model_filter())
-                cr.execute(query, [model])  # cannot be executed in parallel. See git blame.
+    fields = cr.fetchall()
+
+    # drop all the columns at once, `remove_field` is then left with the cleanup of the metadata
+    table = table_of_model(cr, model)
+    if table_exists(cr, table):
+        _remove_columns(cr, table, [field for field, _, _, _ in fields])
+
+    # for mixin, one2many are filtered by their model and res_id.
+    # Several one2many may target the same table, clean each of them only once.
+    o2m_tables = {table_of_model(cr, relation) for _, ftype, relation, store in fields if ftype == "one2many" and store}
+    irs_by_table = {}
+    for ir in indirect_references(cr):
+        if ir.table in o2m_tables and ir.res_id is not None:
+            irs_by_table.setdefault(ir.table, []).append(ir)
+    for o2m_table, irs in irs_by_table.items():
+        query = 'DELETE FROM "{}" WHERE {}'.format(
+            o2m_table, " OR ".join("({})".format(ir.model_filter()) for ir in irs)
+        )
+        cr.execute(query, [model] * len(irs))  # cannot be executed in parallel. See git blame.
+
+    # the same field may be defined by several of the inherited models
+    for field in OrderedDict.fromkeys(field for field, _, _, _ in fields):
         remove_field(cr, model, field, skip_inherit="*")  # inherits will be removed by the recursive call.
 
     # down on inherits of `model`
@@ -47,10 +47,19 @@ from .helpers import _validate_model, table_of_model
 from .misc import on_CI, str2bool, version_gte
 from .models import delete_model
 from .orm import env, flush
-from .pg import column_exists, table_exists, target_of
+from .pg import (
+    _column_exists_cached,
+    column_exists,
+    format_query,
+    named_cursor,
+    table_exists,
+    target_of,
+)
 from .records import ref, remove_menus, remove_records, remove_view, replace_record_references_batch
 
 INSTALLED_MODULE_STATES = ("installed", "to install", "to upgrade")
+# inlined in the queries of `modules_installed`, called over and over, to not adapt it each time
+_INSTALLED_MODULE_STATES_SQL = "({})".format(", ".join("'{}'".format(s) for s in INSTALLED_MODULE_STATES))
 NO_AUTOINSTALL = str2bool(os.getenv("UPG_NO_AUTOINSTALL", "0")) if version_gte("15.0") else False
 _logger = logging.getLogger(__name__)
 
@@ -74,14 +83,20 @@ def modules_installed(cr, *modules):
         upgrade, or for installation; even if they are not yet fully installed.
     """
     assert modules
+    if len(modules) == 1:
+        cr.execute(
+            "SELECT 1 FROM ir_module_module WHERE name = %s AND state IN {}".format(_INSTALLED_MODULE_STATES_SQL),
+            [modules[0]],
+        )
+        return bool(cr.rowcount)
     cr.execute(
         """
             SELECT count(1)
               FROM ir_module_module
              WHERE name IN %s
-               AND state IN %s
-    """,
-        [modules, INSTALLED_MODULE_STATES],
+               AND state IN {}
+    """.format(_INSTALLED_MODULE_STATES_SQL),
+        [modules],
     )
     return cr.fetchone()[0] == len(modules)
 
@@ -98,6 +113,13 @@ def module_installed(cr, module):
     return modules_installed(cr, module)
 
 
+def _execute_ddl(cr, queries):
+    # send them all in one round-trip, in the current transaction; running them in parallel
+    # would commit the cursor and the ALTERs may deadlock on the tables they reference
+    if queries:
+        cr.execute(";\n".join(queries))
+
+
 def uninstall_module(cr, module):
     """
     Uninstall and remove all records owned by a module.
@@ -110,75 +132,82 @@ def uninstall_module(cr, module):
         return
 
     # delete constraints only owned by this module
+    # all parts of the query see the same snapshot, the ownership is computed before the deletion
     cr.execute(
         """
-            SELECT name
-              FROM ir_model_constraint
-          GROUP BY name
-            HAVING array_agg(module) = %s
-    """,
-        ([mod_id],),
+          WITH owned AS (
+                SELECT name
+                  FROM ir_model_constraint
+              GROUP BY name
+                HAVING count(*) = 1
+                   AND min(module) = %s
+          ),
+          _del AS (
+                DELETE
+                  FROM ir_model_constraint
+                 WHERE module = %s
+          )
+        SELECT t.relname, c.conname
+          FROM pg_constraint c
+          JOIN pg_class t
+            ON t.oid = c.conrelid
+          JOIN owned o
+            ON o.name = c.conname
+        """,
+        [mod_id, mod_id],
+    )
+    _execute_ddl(
+        cr,
+        [
+            format_query(cr, "ALTER TABLE {} DROP CONSTRAINT {}", table, constraint)
+            for table, constraint in cr.fetchall()
+        ],
     )
 
-    constraints = tuple(map(itemgetter(0), cr.fetchall()))
-    if constraints:
-        cr.execute(
+    # delete data
+    model_ids, field_ids, menu_ids, server_action_ids = [], [], [], []
+    # stream the records, the most recently created first, and remove consecutive records
+    # of the same model in batch; keeping the creation order avoids breaking the references
+    # between the records of the module
+    with named_cursor(cr, itersize=1000) as ncr:
+        ncr.execute(
             """
-                SELECT table_name, constraint_name
-                  FROM information_schema.table_constraints
-                 WHERE constraint_name IN %s
+                SELECT model, res_id
+                  FROM ir_model_data d
+                 WHERE NOT EXISTS (SELECT 1
+                                     FROM ir_model_data
+                                    WHERE id != d.id
+                                      AND res_id = d.res_id
+                                      AND model = d.model
+                                      AND module != d.module)
+                   AND module = %s
+                   AND model != 'ir.module.module'
+              ORDER BY id DESC
         """,
-            [constraints],
+            [module],
         )
-        for table, constraint in cr.fetchall():
-            cr.execute('ALTER TABLE "%s" DROP CONSTRAINT "%s"' % (table, constraint))
 
-    cr.execute(
-        """
-            DELETE
-              FROM ir_model_constraint
-             WHERE module = %s
-    """,
-        [mod_id],
-    )
+        def other_records():
+            for model, res_id in ncr:
+                if model == "ir.model":
+                    model_ids.append(res_id)
+                elif model == "ir.model.fields":
+                    field_ids.append(res_id)
+                elif model == "ir.ui.menu":
+                    menu_ids.append(res_id)
+                elif model == "ir.actions.server":
+                    server_action_ids.append(res_id)
+                else:
+                    yield model, res_id
 
-    # delete data
-    model_ids, field_ids, menu_ids, server_action_ids = [], [], [], []
-    cr.execute(
-        """
-            SELECT model, res_id
-              FROM ir_model_data d
-             WHERE NOT EXISTS (SELECT 1
-                                 FROM ir_model_data
-                                WHERE id != d.id
-                                  AND res_id = d.res_id
-                                  AND model = d.model
-                                  AND module != d.module)
-               AND module = %s
-               AND model != 'ir.module.module'
-          ORDER BY id DESC
-    """,
-        [module],
-    )
-    to_group = []
-    for model, res_id in cr.fetchall():
-        if model == "ir.model":
-            model_ids.append(res_id)
-        elif model == "ir.model.fields":
-            field_ids.append(res_id)
-        elif model == "ir.ui.menu":
-            menu_ids.append(res_id)
-        elif model == "ir.actions.server":
-            server_action_ids.append(res_id)
-        else:
-            to_group.append((model, res_id))
+        for model, group in itertools.groupby(other_records(), itemgetter(0)):
+            if model == "ir.ui.view":
+                # views need to be removed one by one to handle their inheritance tree
+                for _, res_id in group:
+                    remove_view(cr, view_id=res_id, silent=True)
+            else:
+                remove_records(cr, model, [res_id for _, res_id in group])
 
-    for model, group in itertools.groupby(to_group, lambda it: it[0]):
-        if model == "ir.ui.view":
-            for _, res_id in group:
-                remove_view(cr, view_id=res_id, silent=True)
-        else:
-            remove_records(cr, model, [it[1] for it in group])
     if server_action_ids:
         remove_records(cr, "ir.actions.server", server_action_ids)
 
@@ -188,37 +217,64 @@ def uninstall_module(cr, module):
     # remove relations
     cr.execute(
         """
-            SELECT name
-              FROM ir_model_relation
-          GROUP BY name
-            HAVING array_agg(module) = %s
-    """,
-        ([mod_id],),
+          WITH owned AS (
+                SELECT name
+                  FROM ir_model_relation
+              GROUP BY name
+                HAVING count(*) = 1
+                   AND min(module) = %s
+          ),
+          _del AS (
+                DELETE
+                  FROM ir_model_relation
+                 WHERE module = %s
+          )
+        SELECT t.table_name
+          FROM information_schema.tables t
+          JOIN owned o
+            ON o.name = t.table_name
+        """,
+        [mod_id, mod_id],
     )
-    relations = tuple(map(itemgetter(0), cr.fetchall()))
-    cr.execute("DELETE FROM ir_model_relation WHERE module=%s", (mod_id,))
-    if relations:
-        cr.execute("SELECT table_name FROM information_schema.tables WHERE table_name IN %s", (relations,))
-        for (rel,) in cr.fetchall():
-            cr.execute('DROP TABLE "%s" CASCADE' % (rel,))
-
-    if model_ids:
-        cr.execute("SELECT model FROM ir_model WHERE id IN %s", [tuple(model_ids)])
+    _execute_ddl(cr, [format_query(cr, "DROP TABLE {} CASCADE", rel) for (rel,) in cr.fetchall()])
+
+    if model_ids or field_ids:
+        # owning the `id` field means owning the model. Remove all models first, their fields
+        # will be gone with them and don't need to be removed one by one afterwards.
+        cr.execute(
+            """
+            SELECT model
+              FROM ir_model
+             WHERE id = ANY(%s)
+             UNION
+            SELECT model
+              FROM ir_model_fields
+             WHERE id = ANY(%s)
+               AND name = 'id'
+            """,
+            [model_ids, field_ids],
+        )
         for (model,) in cr.fetchall():
             delete_model(cr, model)
 
     if field_ids:
-        cr.execute("SELECT model, name FROM ir_model_fields WHERE id IN %s", [tuple(field_ids)])
+        cr.execute("SELECT model, name FROM ir_model_fields WHERE id = ANY(%s) AND name != 'id'", [field_ids])
         for model, name in cr.fetchall():
-            if name == "id":
-                delete_model(cr, model)
-            else:
-                remove_field(cr, model, name)
+            remove_field(cr, model, name)
 
-    cr.execute("DELETE FROM ir_model_data WHERE module=%s", (module,))
+    # clean up what remains in a single statement
+    cleanups = ["_del_imd AS (DELETE FROM ir_model_data WHERE module = %(module)s)"]
     if table_exists(cr, "ir_translation"):
-        cr.execute("DELETE FROM ir_translation WHERE module=%s", [module])
-    cr.execute("UPDATE ir_module_module SET state='uninstalled' WHERE name=%s", (module,))
+        cleanups.append("_del_trans AS (DELETE FROM ir_translation WHERE module = %(module)s)")
+    cr.execute(
+        """
+          WITH {}
+        UPDATE ir_module_module
+           SET state = 'uninstalled'
+         WHERE name = %(module)s
+        """.format(", ".join(cleanups)),
+        {"module": module},
+    )
 
 
 def uninstall_theme(cr, theme, base_theme=None):
@@ -303,15 +359,16 @@ def _update_view_key(cr, old, new):
     # COWed views.
     # View key is not always equal to it's xml_id (eg when created through a
     # website.page record, the key is the page xml_id suffixed by `_view`)
-    if not column_exists(cr, "ir_ui_view", "key"):
+    if not _column_exists_cached(cr, "ir_ui_view", "key"):
         return
     like_old = old.replace("_", r"\_").replace("%", r"\%")
     cr.execute(
         """
         UPDATE ir_ui_view
-           SET key = concat('{new}', right(key, -length('{old}')))
-         WHERE key LIKE '{like_old}.%'
-    """.format(old=old, new=new, like_old=like_old)
+           SET key = concat(%s, right(key, -length(%s)))
+         WHERE key LIKE %s
+        """,
+        [new, old, like_old + ".%"],
     )
 
 
@@ -488,6 +545,21 @@ def force_install_module(cr, module, if_installed=None):
                                            already installed
     :return str: the *original* state of the module
     """
+    states, pending = _force_install_modules(cr, [module], if_installed)
+
+    # auto_install modules, one dependency level at a time
+    while pending:
+        _logger.debug("auto install modules %r due to modules being force installed", pending)
+        _, pending = _force_install_modules(cr, pending)
+
+    # TODO handle module exclusions
+
+    return states.get(module)
+
+
+def _force_install_modules(cr, modules, if_installed=None):
+    # mark `modules` and their dependencies for installation, return the states of the marked
+    # modules and the names of the auto_install modules to install as a consequence
     subquery = ""
     subparams = ()
     if if_installed:
@@ -496,80 +568,88 @@ def force_install_module(cr, module, if_installed=None):
                                     AND state IN %s)"""
         subparams = (tuple(if_installed), INSTALLED_MODULE_STATES)
 
+    # Same algo as ir.module.module.button_install(): https://git.io/fhCKd
+    dep_match = ""
+    if _column_exists_cached(cr, "ir_module_module_dependency", "auto_install_required"):
+        dep_match = "AND d.auto_install_required = TRUE AND e.auto_install_required = TRUE"
+
+    cat_match = ""
+    if NO_AUTOINSTALL:
+        # even if we skip auto installs, we still need to auto install the real link-modules.
+        # those are in the "Hidden" category
+        hidden = ref(cr, "base.module_category_hidden")
+        cat_match = cr.mogrify("AND on_me.category_id = %s", [hidden]).decode()
+
+    # Mark the module and its dependencies for installation, and in the same query, find the
+    # auto_install modules that now have all their dependencies (to be) installed.
     cr.execute(
         """
         WITH RECURSIVE deps (mod_id, dep_name) AS (
               SELECT m.id, d.name from ir_module_module_dependency d
               JOIN ir_module_module m on (d.module_id = m.id)
-              WHERE m.name = %s
+              WHERE m.name = ANY(%s)
             UNION
               SELECT m.id, d.name from ir_module_module m
               JOIN deps ON deps.dep_name = m.name
               JOIN ir_module_module_dependency d on (d.module_id = m.id)
+        ),
+        upd AS (
+            UPDATE ir_module_module m
+               SET state = CASE WHEN state = 'to remove' THEN 'to upgrade'
+                                WHEN state = 'uninstalled' THEN 'to install'
+                                ELSE state
+                           END,
+                   demo=(select demo from ir_module_module where name='base')
+              FROM deps d
+             WHERE m.id = d.mod_id
+               {0}
+         RETURNING m.name, m.state
         )
-        UPDATE ir_module_module m
-           SET state = CASE WHEN state = 'to remove' THEN 'to upgrade'
-                            WHEN state = 'uninstalled' THEN 'to install'
-                            ELSE state
-                       END,
-               demo=(select demo from ir_module_module where name='base')
-          FROM deps d
-         WHERE m.id = d.mod_id
-           {0}
-     RETURNING m.name, m.state
-    """.format(subquery),
-        (module,) + subparams,
+        SELECT name, state, false
+          FROM upd
+         UNION ALL
+        SELECT on_me.name, on_me.state, true
+          FROM upd
+          JOIN ir_module_module_dependency d ON d.name = upd.name
+          JOIN ir_module_module on_me ON on_me.id = d.module_id
+          JOIN ir_module_module_dependency e ON e.module_id = on_me.id
+          JOIN ir_module_module its_deps ON its_deps.name = e.name
+     LEFT JOIN upd its_upd ON its_upd.name = its_deps.name
+         WHERE upd.state = 'to install'
+           AND on_me.state = 'uninstalled'
+           AND on_me.auto_install = TRUE
+           AND on_me.name NOT IN (SELECT name FROM upd)
+           {1}
+           {2}
+      GROUP BY on_me.name, on_me.state
+        HAVING
+               -- are all dependencies (to be) installed?
+               array_agg(COALESCE(its_upd.state, its_deps.state))::text[] <@ %s
+    """.format(subquery, dep_match, cat_match),
+        (list(modules),) + subparams + (list(INSTALLED_MODULE_STATES),),
     )
 
-    states = dict(cr.fetchall())
-    # auto_install modules...
-    toinstall = [m for m in states if states[m] == "to install"]
-    if toinstall:
-        # Same algo as ir.module.module.button_install(): https://git.io/fhCKd
-        dep_match = ""
-        if column_exists(cr, "ir_module_module_dependency", "auto_install_required"):
-            dep_match = "AND d.auto_install_required = TRUE AND e.auto_install_required = TRUE"
-
-        cat_match = ""
-        if NO_AUTOINSTALL:
-            # even if we skip auto installs, we still need to auto install the real link-modules.
-            # those are in the "Hidden" category
-            hidden = ref(cr, "base.module_category_hidden")
-            cat_match = cr.mogrify("AND on_me.category_id = %s", [hidden]).decode()
-
-        cr.execute(
-            """
-            SELECT on_me.name
-              FROM ir_module_module_dependency d
-              JOIN ir_module_module on_me ON on_me.id = d.module_id
-              JOIN ir_module_module_dependency e ON e.module_id = on_me.id
-              JOIN ir_module_module its_deps ON its_deps.name = e.name
-             WHERE d.name = ANY(%s)
-               AND on_me.state = 'uninstalled'
-               AND on_me.auto_install = TRUE
-               {}
-               {}
-          GROUP BY on_me.name
-            HAVING
-                   -- are all dependencies (to be) installed?
-                   array_agg(its_deps.state)::text[] <@ %s
-        """.format(dep_match, cat_match),
-            [toinstall, list(INSTALLED_MODULE_STATES)],
-        )
-        for (mod,) in cr.fetchall():
-            _logger.debug("auto install module %r due to module %r being force installed", mod, module)
-            force_install_module(cr, mod)
-
-    # TODO handle module exclusions
-
-    return states.get(module)
+    states = {}
+    auto_installs = []
+    for name, state, auto_install in cr.fetchall():
+        if auto_install:
+            auto_installs.append(name)
+        else:
+            states[name] = state
+    return states, auto_installs
 
 
 def _assert_modules_exists(cr, *modules):
     assert modules
-    cr.execute("SELECT name FROM ir_module_module WHERE name IN %s", [modules])
-    existing_modules = {m[0] for m in cr.fetchall()}
-    unexisting_modules = set(modules) - existing_modules
+    cr.execute(
+        """
+        SELECT m.name
+          FROM unnest(%s::varchar[]) AS m(name)
+         WHERE NOT EXISTS(SELECT 1 FROM ir_module_module WHERE name = m.name)
+        """,
+        [list(set(modules))],
+    )
+    unexisting_modules = [m for (m,) in cr.fetchall()]
     if unexisting_modules:
         raise AssertionError("Unexisting modules: {}".format(", ".join(unexisting_modules)))
 
@@ -626,7 +706,7 @@ def module_deps_diff(cr, module, plus=(), minus=()):
 
 
 def module_auto_install(cr, module, auto_install):
-    if column_exists(cr, "ir_module_module_dependency", "auto_install_required"):
+    if _column_exists_cached(cr, "ir_module_module_dependency", "auto_install_required"):
         params = []
         if auto_install is True:
             value = "TRUE"
@@ -653,7 +733,7 @@ def module_auto_install(cr, module, auto_install):
 def trigger_auto_install(cr, module):
     _assert_modules_exists(cr, module)
     dep_match = "true"
-    if column_exists(cr, "ir_module_module_dependency", "auto_install_required"):
+    if _column_exists_cached(cr, "ir_module_module_dependency", "auto_install_required"):
         dep_match = "d.auto_install_required = true"
 
     cat_match = "true"
@@ -717,18 +797,29 @@ def new_module(cr, module, deps=(), auto_install=False, category=None):
             """,
             [module, state],
         )
-        (new_id,) = cr.fetchone()
+        (mod_id,) = cr.fetchone()
 
         cr.execute(
             """
             INSERT INTO ir_model_data (name, module, noupdate, model, res_id)
                  VALUES ('module_'||%s, 'base', 't', 'ir.module.module', %s)
             """,
-            [module, new_id],
+            [module, mod_id],
         )
 
-    for dep in deps:
-        new_module_dep(cr, module, dep)
+    if deps:
+        cr.execute(
+            """
+            INSERT INTO ir_module_module_dependency(name, module_id)
+                 SELECT DISTINCT d.name, %s
+                   FROM unnest(%s::varchar[]) AS d(name)
+            RETURNING (SELECT state FROM ir_module_module WHERE id = module_id)
+            """,
+            [mod_id, list(deps)],
+        )
+        if cr.rowcount and cr.fetchone()[0] in INSTALLED_MODULE_STATES:
+            # module was already installed, install all its deps, recursively
+            force_install_module(cr, module)
 
     if category is not None:
         _set_module_category(cr, module, category)
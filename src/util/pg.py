@@ -2,6 +2,7 @@
 """Utility functions for interacting with PostgreSQL."""
 
 import collections
+import io
 import logging
 import os
 import re
@@ -29,8 +30,15 @@ try:  # noqa: SIM105
 except NameError:
     pass
 
+# python3 shims
+try:
+    unicode  # noqa: B018
+except NameError:
+    unicode = str
+
 import psycopg2
 from psycopg2 import errorcodes, sql
+from psycopg2.extras import execute_values
 
 try:
     from odoo.sql_db import db_connect
@@ -45,6 +53,28 @@ _logger = logging.getLogger(__name__)
 
 ON_DELETE_ACTIONS = frozenset(("SET NULL", "CASCADE", "RESTRICT", "NO ACTION", "SET DEFAULT"))
 MAX_BUCKETS = int(os.getenv("MAX_BUCKETS", "150000"))
+# above this number of rows, `bulk_update_table` sends the values through a `COPY`
+_BULK_COPY_THRESHOLD = 500
+
+_EXISTING_COLUMNS = set()
+# columns of core tables that are never dropped, nor renamed, once they exist; the only ones
+# `_column_exists_cached` can safely memoize
+_STABLE_COLUMNS = frozenset(
+    [
+        ("ir_attachment", "res_field"),
+        ("ir_filters", "sort"),
+        ("ir_model", "order"),
+        ("ir_model_fields", "compute"),
+        ("ir_model_fields", "depends"),
+        ("ir_model_fields", "relation_table"),
+        ("ir_module_module_dependency", "auto_install_required"),
+        ("ir_ui_view", "active"),
+        ("ir_ui_view", "arch_db"),
+        ("ir_ui_view", "key"),
+        ("ir_ui_view", "mode"),
+        ("mail_alias", "alias_defaults"),
+    ]
+)
 
 
 class PGRegexp(str):
@@ -354,6 +384,88 @@ def explode_execute(cr, query, table, alias=None, bucket_size=10000, logger=_log
     )
 
 
+def _copy_text(value):
+    if value is None:
+        return "\\N"
+    if not isinstance(value, unicode):
+        value = unicode(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def bulk_update_table(cr, table, column, values, key_col="id"):
+    """
+    Update a column of a table with a different value per row.
+
+    The values are sent through a `COPY` into a temporary table when there are many of
+    them, and through a single `UPDATE ... FROM (VALUES ...)` otherwise.
+
+    .. example::
+       .. code-block:: python
+
+          util.bulk_update_table(cr, "ir_filters", "context", [(1, "{}"), (2, "{'group_by': []}")])
+
+    :param str table: table to update
+    :param str column: column to update
+    :param list(tuple) values: `(key, value)` pairs, `key` being the value of `key_col`
+                               of the row to update, `value` the new value for `column`
+    :param str key_col: column identifying the rows to update
+    """
+    values = list(values)
+    if not values:
+        return
+    if len(values) < _BULK_COPY_THRESHOLD:
+        query = format_query(
+            cr,
+            """
+            UPDATE {table} t
+               SET {column} = v.value::{type}
+              FROM (VALUES %s) AS v(key, value)
+             WHERE t.{key_col} = v.key
+            """,
+            table=table,
+            column=column,
+            key_col=key_col,
+            type=column_type(cr, table, column),
+        )
+        execute_values(cr._obj, query, values)
+        return
+
+    tmp_table = "_upgrade_bulk_update_{}".format(uuid.uuid4().hex)
+    cr.execute(
+        format_query(
+            cr,
+            """
+            CREATE TEMP TABLE {tmp} ON COMMIT DROP AS
+                 SELECT {key_col} AS key, {column} AS value
+                   FROM {table}
+              WITH NO DATA
+            """,
+            tmp=tmp_table,
+            key_col=key_col,
+            column=column,
+            table=table,
+        )
+    )
+    data = io.StringIO("".join("\t".join((_copy_text(key), _copy_text(value))) + "\n" for key, value in values))
+    cr._obj.copy_expert(format_query(cr, "COPY {} (key, value) FROM STDIN", tmp_table), data)
+    cr.execute(
+        format_query(
+            cr,
+            """
+            UPDATE {table} t
+               SET {column} = v.value
+              FROM {tmp} v
+             WHERE t.{key_col} = v.key
+            """,
+            table=table,
+            column=column,
+            key_col=key_col,
+            tmp=tmp_table,
+        )
+    )
+    cr.execute(format_query(cr, "DROP TABLE {}", tmp_table))
+
+
 def pg_array_uniq(a, drop_null=False):
     dn = "WHERE x IS NOT NULL" if drop_null else ""
     return "ARRAY(SELECT x FROM unnest({0}) x {1} GROUP BY x)".format(a, dn)
@@ -444,6 +556,32 @@ def column_exists(cr, table, column):
     return _column_info(cr, table, column) is not None
 
 
+def _column_exists_cached(cr, table, column):
+    """
+    Return whether a column exists, memoizing positive answers.
+
+    Meant for columns of core tables probed over and over, like `ir_ui_view.key`. Only
+    existing columns listed in `_STABLE_COLUMNS` are memoized, other columns may be added
+    or dropped by upgrade scripts with raw SQL and are always probed. The memoized columns
+    are forgotten when removed via :func:`remove_column` or :func:`rename_table`.
+    """
+    if (table, column) not in _STABLE_COLUMNS:
+        return column_exists(cr, table, column)
+    key = (cr.dbname, table, column)
+    if key in _EXISTING_COLUMNS:
+        return True
+    if column_exists(cr, table, column):
+        _EXISTING_COLUMNS.add(key)
+        return True
+    return False
+
+
+def _forget_columns(cr, table, column=None):
+    for key in list(_EXISTING_COLUMNS):
+        if key[:2] == (cr.dbname, table) and column in (None, key[2]):
+            _EXISTING_COLUMNS.discard(key)
+
+
 def column_type(cr, table, column):
     """
     Return the type of a column, if it exists.
@@ -568,6 +706,23 @@ def remove_column(cr, table, column, cascade=False):
         drop_depending_views(cr, table, column)
         drop_cascade = " CASCADE" if cascade else ""
         cr.execute('ALTER TABLE "{0}" DROP COLUMN "{1}"{2}'.format(table, column, drop_cascade))
+        _forget_columns(cr, table, column)
+
+
+def _remove_columns(cr, table, columns, cascade=False):
+    # drop several columns with a single `ALTER TABLE`; a column can only be dropped once
+    columns = [column for column in collections.OrderedDict.fromkeys(columns) if column_exists(cr, table, column)]
+    if not columns:
+        return
+    for column in columns:
+        drop_depending_views(cr, table, column)
+    drop_cascade = " CASCADE" if cascade else ""
+    drops = sql.SQL(", ").join(
+        sql.SQL("DROP COLUMN {}{}").format(sql.Identifier(column), sql.SQL(drop_cascade)) for column in columns
+    )
+    cr.execute(format_query(cr, "ALTER TABLE {} {}", table, drops))
+    for column in columns:
+        _forget_columns(cr, table, column)
 
 
 def alter_column_type(cr, table, column, type, using=None, logger=_logger):
@@ -814,28 +969,42 @@ def _get_unique_indexes_with(cr, table, *columns):
 
     return a list of tuple [index_name, list_of_column]
     """
-    _validate_table(table)
     assert columns
+    return [(name, attrs) for name, attrs in _get_unique_indexes_of(cr, table)[table] if set(columns) <= set(attrs)]
+
+
+def _get_unique_indexes_of(cr, *tables):
+    # (Cursor, *str) -> Dict[str, List[Tuple[str, List[str]]]
+    """
+    Return all unique indexes of `tables`, in a single query.
+
+    return a dict {table_name: [(index_name, list_of_column)]}
+    """
+    for table in tables:
+        _validate_table(table)
+    result = collections.defaultdict(list)
+    if not tables:
+        return result
     cr.execute(
         """
-        SELECT name, attrs
-          FROM (SELECT quote_ident(i.relname) as name,
-                       array_agg(a.attname::text) as attrs
-                  FROM (select *, unnest(indkey) as unnest_indkey from pg_index) x
-                  JOIN pg_class c ON c.oid = x.indrelid
-                  JOIN pg_class i ON i.oid = x.indexrelid
-                  JOIN pg_attribute a ON (a.attrelid=c.oid AND a.attnum=x.unnest_indkey)
-                 WHERE (c.relkind = ANY (ARRAY['r'::"char", 'm'::"char"]))
-                   AND i.relkind = 'i'::"char"
-                   AND c.relname = %s
-                   AND x.indisunique
-              GROUP BY 1
-          ) idx
-         WHERE attrs @> %s
+        SELECT c.relname,
+               quote_ident(i.relname) as name,
+               array_agg(a.attname::text) as attrs
+          FROM (select *, unnest(indkey) as unnest_indkey from pg_index) x
+          JOIN pg_class c ON c.oid = x.indrelid
+          JOIN pg_class i ON i.oid = x.indexrelid
+          JOIN pg_attribute a ON (a.attrelid=c.oid AND a.attnum=x.unnest_indkey)
+         WHERE (c.relkind = ANY (ARRAY['r'::"char", 'm'::"char"]))
+           AND i.relkind = 'i'::"char"
+           AND c.relname IN %s
+           AND x.indisunique
+      GROUP BY 1, 2
     """,
-        [table, list(columns)],
+        [tuple(set(tables))],
     )
-    return cr.fetchall()
+    for table, name, attrs in cr.fetchall():
+        result[table].append((name, attrs))
+    return result
 
 
 def create_index(cr, name, table_name, *columns):
@@ -1015,6 +1184,7 @@ def rename_table(cr, old_table, new_table, remove_constraints=True):
         )
 
     cr.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(old_table), sql.Identifier(new_table)))
+    _forget_columns(cr, old_table)
 
     # rename pkey sequence
     cr.execute(
@@ -1066,13 +1236,16 @@ def rename_table(cr, old_table, new_table, remove_constraints=True):
         """,
         [new_table, new_pkey, "%" + old_table.replace("_", r"\_") + r"\_%"],
     )
-    for (idx,) in cr.fetchall():
-        cr.execute(
-            sql.SQL("ALTER INDEX {} RENAME TO {}").format(
-                sql.Identifier(idx),
-                sql.Identifier(idx.replace(old_table, new_table)),
-            )
+    # send all the renames at once, there is one index per indexed column
+    renames = [
+        sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+            sql.Identifier(idx),
+            sql.Identifier(idx.replace(old_table, new_table)),
         )
+        for (idx,) in cr.fetchall()
+    ]
+    if renames:
+        cr.execute(sql.SQL(";\n").join(renames))
 
     if remove_constraints:
         # DELETE all constraints, except Primary/Foreign keys, they will be re-created by the ORM
@@ -1107,14 +1280,17 @@ def rename_table(cr, old_table, new_table, remove_constraints=True):
         [new_table, old_table.replace("_", r"\_") + r"\_%"],
     )
     old_table_length = len(old_table)
+    renames = []
     for (old_fkey,) in cr.fetchall():
         new_fkey = new_table + old_fkey[old_table_length:]
         _logger.info("Renaming FK %r to %r", old_fkey, new_fkey)
-        cr.execute(
+        renames.append(
             sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
                 sql.Identifier(new_table), sql.Identifier(old_fkey), sql.Identifier(new_fkey)
             )
         )
+    if renames:
+        cr.execute(sql.SQL(";\n").join(renames))
 
 
 def find_new_table_column_name(cr, table, name):
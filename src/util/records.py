@@ -37,6 +37,7 @@ from .misc import parse_version, version_gte
 from .orm import env, flush
 from .pg import (
     PGRegexp,
+    _column_exists_cached,
     _get_unique_indexes_with,
     _validate_table,
     column_exists,
@@ -101,7 +102,7 @@ def remove_view(cr, xml_id=None, view_id=None, silent=False, key=None):
 
     # From given or determined xml_id, the views duplicated in a multi-website
     # context are to be found and removed.
-    if xml_id != "?" and column_exists(cr, "ir_ui_view", "key"):
+    if xml_id != "?" and _column_exists_cached(cr, "ir_ui_view", "key"):
         cr.execute("SELECT id FROM ir_ui_view WHERE key = %s AND id != %s", [xml_id, view_id])
         for [v_id] in cr.fetchall():
             remove_view(cr, view_id=v_id, silent=silent, key=xml_id)
@@ -146,11 +147,11 @@ def remove_view(cr, xml_id=None, view_id=None, silent=False, key=None):
             """
             # In 8.0, disabling requires setting mode to 'primary'
             extra_set_sql = ""
-            if column_exists(cr, "ir_ui_view", "mode"):
+            if _column_exists_cached(cr, "ir_ui_view", "mode"):
                 extra_set_sql = ",  mode = 'primary' "
 
             # Column was not present in v7 and it's older version
-            if column_exists(cr, "ir_ui_view", "active"):
+            if _column_exists_cached(cr, "ir_ui_view", "active"):
                 extra_set_sql += ", active = false "
 
             disable_view_query = disable_view_query % extra_set_sql
@@ -231,7 +232,7 @@ def edit_view(cr, xmlid=None, view_id=None, skip_if_not_noupdate=True, active="a
             view_id, noupdate = data
 
     if view_id and not (skip_if_not_noupdate and not noupdate):
-        arch_col = "arch_db" if column_exists(cr, "ir_ui_view", "arch_db") else "arch"
+        arch_col = "arch_db" if _column_exists_cached(cr, "ir_ui_view", "arch_db") else "arch"
         jsonb_column = column_type(cr, "ir_ui_view", arch_col) == "jsonb"
         cr.execute(
             """
@@ -289,10 +290,10 @@ def add_view(cr, name, model, view_type, arch_db, inherit_xml_id=None, priority=
                 "Unable to add view '%s' because its inherited view '%s' cannot be found!" % (name, inherit_xml_id)
             )
     # Odoo <= 8.0 doesn't have the `key`
-    key_exist = column_exists(cr, "ir_ui_view", "key")
+    key_exist = _column_exists_cached(cr, "ir_ui_view", "key")
     if key_exist and view_type == "qweb" and not key:
         key = "gen_key.%s" % str(uuid.uuid4())[:6]
-    arch_col = "arch_db" if column_exists(cr, "ir_ui_view", "arch_db") else "arch"
+    arch_col = "arch_db" if _column_exists_cached(cr, "ir_ui_view", "arch_db") else "arch"
     jsonb_column = column_type(cr, "ir_ui_view", arch_col) == "jsonb"
     arch_column_value = Json({"en_US": arch_db}) if jsonb_column else arch_db
     cr.execute(
@@ -418,7 +419,7 @@ def remove_records(cr, model, ids):
         # A group is gone, the auto-generated view `base.user_groups_view` is outdated.
         # Create a shim. It will be re-generated later by creating/updating groups or
         # explicitly in `base/0.0.0/end-user_groups_view.py`.
-        arch_col = "arch_db" if column_exists(cr, "ir_ui_view", "arch_db") else "arch"
+        arch_col = "arch_db" if _column_exists_cached(cr, "ir_ui_view", "arch_db") else "arch"
         jsonb_column = column_type(cr, "ir_ui_view", arch_col) == "jsonb"
         arch_value = "json_build_object('en_US', '<form/>')" if jsonb_column else "'<form/>'"
         cr.execute(
@@ -739,7 +740,7 @@ def rename_xmlid(cr, old, new, noupdate=None, on_collision="fail"):
         model, new_id = cr.fetchone() or (None, None)
 
     if model and new_id:
-        if model == "ir.ui.view" and column_exists(cr, "ir_ui_view", "key"):
+        if model == "ir.ui.view" and _column_exists_cached(cr, "ir_ui_view", "key"):
             cr.execute("UPDATE ir_ui_view SET key=%s WHERE id=%s AND key=%s", [new, new_id, old])
             if cr.rowcount:
                 # iif the key has been updated for this view, also update it for all other cowed views.
@@ -1308,6 +1309,8 @@ def replace_record_references_batch(cr, id_mapping, model_src, model_dst=None, r
 
     cr.execute("CREATE UNLOGGED TABLE _upgrade_rrr(old int PRIMARY KEY, new int)")
     execute_values(cr, "INSERT INTO _upgrade_rrr (old, new) VALUES %s", id_mapping.items())
+    # the mapping is joined by all the updates below, give the planner its actual size
+    cr.execute("ANALYZE _upgrade_rrr")
 
     if model_src == model_dst:
         fk_def = []